@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+
+__author__ = 'Yatharth Agarwal <yatharth999@gmail.com>'
+
+"""Define a board that moves and collides characters in bulk with NumPy"""
+
+import math
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from board import Board
+from players import PC, turn
+from statehash import MASK, digest
+
+
+class ArrayBoard(Board):
+    """Keep positions in contiguous arrays, leaving eats and bounces to the usual rules
+
+    The arrays own x, y and direction between ticks. Characters only get those copied back
+    when a rule needs them (contacts, respawns) or on sync, so a tick costs a handful of
+    array operations rather than a Python call per character.
+
+    Queries look through the rows as sorted by column, then y, after the last step, plus
+    whichever rows have changed since, rather than through every row.
+    """
+
+    FIELDS = ('xs', 'ys', 'last_xs', 'last_ys', 'directions', 'radii', 'velocities', 'row_levels', 'row_serials')
+    ARRAYS = FIELDS + ('is_pc', 'is_static', 'digests', 'ranks', 'dirty_at')
+    DIRTY_LIMIT = 256       # rows changed since the last sort before the rows get sorted again
+    SPAWN_BATCH = 32        # spawn spots checked together, since a pass costs much the same for one or many
+    MAX_COLUMNS = 1024      # most columns rows get sorted into
+    STRIDE = 4.0            # gap between columns' sort keys, wider than any y a query looks for
+
+    def __init__(self, seed=None):
+        if numpy is None:
+            raise ImportError("ArrayBoard needs numpy")
+        super(ArrayBoard, self).__init__(seed)
+
+        # the arrays stand in for the usual index
+        self.index = self
+        self.members, self.rows = [], {}
+        self.capacity = 0
+        self.is_pc = numpy.zeros(0, dtype=bool)
+        self.is_static = numpy.zeros(0, dtype=bool)    # rows the usual board would keep static (see Board.static)
+        self.digests = numpy.zeros(0, dtype=numpy.uint64)
+        self.ranks = numpy.zeros(0, dtype=int)      # where each row sits in order, or -1 if it's changed since
+        self.dirty_at = numpy.zeros(0, dtype=int)   # where each changed row sits in dirty, or -1
+        self.dirty = numpy.zeros(self.DIRTY_LIMIT, dtype=int)
+        self.no_of_dirty = 0
+        for field in self.FIELDS:
+            setattr(self, field, numpy.zeros(0))
+        self.sort()
+
+    def static(self, c):
+        """Keep every character in the arrays, where sitting still costs next to nothing anyway
+
+        Rows still note whether the usual board would keep them static, so they move and pair
+        up just as they would there.
+        """
+        return False
+
+    def grow(self):
+        """Double the arrays' capacity, keeping their contents"""
+        self.capacity = max(64, 2 * self.capacity)
+        for field in self.ARRAYS:
+            old = getattr(self, field)
+            new = numpy.zeros(self.capacity, dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, field, new)
+
+    def push(self, c):
+        """Copy a character's state into its row"""
+        row = self.rows[c]
+        self.xs[row], self.ys[row], self.directions[row] = c.x, c.y, c.direction
+        self.last_xs[row], self.last_ys[row] = c.last_x, c.last_y
+        self.radii[row], self.velocities[row] = c.radius, c.velocity
+        self.row_levels[row], self.row_serials[row], self.digests[row] = c._level, c.serial, c.digest
+        self.is_pc[row], self.is_static[row] = isinstance(c, PC), Board.static(self, c)
+
+    def pull(self, c):
+        """Copy a character's row back onto it"""
+        row = self.rows[c]
+        c.x, c.y, c.direction = float(self.xs[row]), float(self.ys[row]), float(self.directions[row])
+        c.last_x, c.last_y = float(self.last_xs[row]), float(self.last_ys[row])
+        c.digest = int(self.digests[row])
+
+    def sync(self):
+        """Bring every character up to date with the arrays"""
+        for c in self.members:
+            self.pull(c)
+
+    def insert(self, c):
+        """Give a character the next row"""
+        if len(self.members) == self.capacity:
+            self.grow()
+        row = self.rows[c] = len(self.members)
+        self.members.append(c)
+        self.push(c)
+        self.ranks[row] = self.dirty_at[row] = -1
+        self.changed(row)
+
+    def remove(self, c):
+        """Swap the last row into the leaving character's place"""
+        self.pull(c)
+        row, last = self.rows.pop(c), self.members.pop()
+        self.forget(row)
+        if last is not c:
+            moved = len(self.members)
+            self.members[row], self.rows[last] = last, row
+            for field in self.ARRAYS:
+                array = getattr(self, field)
+                array[row] = array[moved]
+            if self.ranks[row] >= 0:
+                self.order[self.ranks[row]] = row
+            if self.dirty_at[row] >= 0:
+                self.dirty[self.dirty_at[row]] = row
+
+    def move(self, c):
+        self.push(c)
+        self.changed(self.rows[c])
+
+    def changed(self, row):
+        """Take a row that may have left its place out of order, sorting again once too many have"""
+        if self.ranks[row] >= 0:
+            self.order[self.ranks[row]] = -1
+            self.ranks[row] = -1
+        if self.dirty_at[row] < 0:
+            if self.no_of_dirty == self.DIRTY_LIMIT:
+                self.sort()
+                return
+            self.dirty[self.no_of_dirty], self.dirty_at[row] = row, self.no_of_dirty
+            self.no_of_dirty += 1
+
+    def forget(self, row):
+        """Take a row that's being emptied out of both order and dirty"""
+        if self.ranks[row] >= 0:
+            self.order[self.ranks[row]] = -1
+        i = self.dirty_at[row]
+        if i >= 0:
+            self.no_of_dirty -= 1
+            last = self.dirty[self.no_of_dirty]
+            self.dirty[i], self.dirty_at[last] = last, i
+
+    def sort(self):
+        """Sort the rows by column, then y, for queries to search
+
+        Columns are twice the widest radius across, so a query looks down three at most.
+        """
+        n = len(self.members)
+        self.reach = float(self.radii[:n].max()) if n else 0.0      # widest radius among sorted rows
+        self.columns = int(min(self.MAX_COLUMNS, 0.5 / self.reach)) if self.reach else 1
+        keys = self.column(self.xs[:n]) * self.STRIDE + self.ys[:n]
+        self.order = numpy.argsort(keys, kind='mergesort')             # rows by key, -1 where one has left
+        self.sorted_keys = keys[self.order]
+        self.ranks[self.order] = numpy.arange(n)
+        self.dirty_at[:n] = -1
+        self.no_of_dirty = 0
+
+    def column(self, xs):
+        """Return the column each of some x's falls in"""
+        return numpy.clip((xs * self.columns).astype(int), 0, self.columns - 1)
+
+    def rehash(self, c):
+        """Keep the row's digest, and what it's worked out from, in step too"""
+        super(ArrayBoard, self).rehash(c)
+        row = self.rows.get(c)
+        if row is not None:
+            self.row_levels[row], self.row_serials[row], self.digests[row] = c._level, c.serial, c.digest
+
+    def arrange(self, members):
+        """Put characters in the given row order, as when restoring a snapshot"""
+        self.members = list(members)
+        self.rows = dict((c, row) for row, c in enumerate(self.members))
+        for c in self.members:
+            self.push(c)
+        self.sort()
+
+    def touching(self, cs):
+        """Return the (owners, rows) of everything overlapping any of some characters, tested all at once
+
+        Each character gets tested against the rows near it in each column it reaches into, laid
+        out one window after another as in overlaps, and against the changed rows. The test is
+        the same sum as Character.collides, run on the same numbers, so it's exact. Owners are
+        positions in cs.
+        """
+        count = len(cs)
+        xs = numpy.array([c.x for c in cs])
+        ys = numpy.array([c.y for c in cs])
+        radii = numpy.array([c.radius for c in cs])
+        extents = radii + self.reach
+
+        # a window per column each character reaches into, then the rows in each
+        firsts = self.column(xs - extents)
+        spans = self.column(xs + extents) - firsts + 1
+        windows = numpy.repeat(numpy.arange(count), spans)
+        columns = numpy.arange(spans.sum()) + numpy.repeat(firsts - numpy.cumsum(spans) + spans, spans)
+        bottoms = numpy.maximum(ys - extents, 1 - self.STRIDE / 2)[windows]
+        tops = numpy.minimum(ys + extents, self.STRIDE / 2)[windows]
+        starts = self.sorted_keys.searchsorted(columns * self.STRIDE + bottoms, 'left')
+        counts = self.sorted_keys.searchsorted(columns * self.STRIDE + tops, 'right') - starts
+        owners = windows[numpy.repeat(numpy.arange(len(windows)), counts)]
+        rows = self.order[numpy.arange(counts.sum()) + numpy.repeat(starts - numpy.cumsum(counts) + counts, counts)]
+        self.checks += len(rows) + count * self.no_of_dirty
+
+        dx, dy, reaches = self.xs[rows] - xs[owners], self.ys[rows] - ys[owners], self.radii[rows] + radii[owners]
+        close = (dx * dx + dy * dy <= reaches * reaches) & (rows >= 0)
+        owners, rows = owners[close], rows[close]
+
+        if self.no_of_dirty:
+            dirty = self.dirty[:self.no_of_dirty]
+            dx, dy = self.xs[dirty] - xs[:, None], self.ys[dirty] - ys[:, None]
+            reaches = self.radii[dirty] + radii[:, None]
+            extra_owners, extra = numpy.nonzero(dx * dx + dy * dy <= reaches * reaches)
+            owners, rows = numpy.concatenate((owners, extra_owners)), numpy.concatenate((rows, dirty[extra]))
+
+        # leave out the characters themselves, and pairs of static ones on the board, as the usual board does
+        selves = numpy.array([self.rows.get(c, -1) for c in cs])
+        statics = numpy.array([c in self.rows and Board.static(self, c) for c in cs])
+        kept = (rows != selves[owners]) & ~(statics[owners] & self.is_static[rows])
+        return owners[kept], rows[kept]
+
+    def frees(self, cs):
+        owners, _ = self.touching(cs)
+        return (numpy.bincount(owners, minlength=len(cs)) == 0).tolist()
+
+    def collision_with(self, c):
+        """Return the oldest character overlapping a character, bringing only it up to date"""
+        _, rows = self.touching([c])
+        if not len(rows):
+            return None
+        other = self.members[int(rows[self.row_serials[rows].argmin()])]
+        self.pull(other)
+        return other
+
+    def collisions_with(self, c):
+        return self.collisions_with_each([c])[0]
+
+    def collisions_with_each(self, cs):
+        """Look for everything overlapping several characters in one pass, bringing it up to date"""
+        owners, rows = self.touching(cs)
+        order = numpy.lexsort((self.row_serials[rows], owners))
+        found = [[] for _ in cs]
+        for owner, row in zip(owners[order].tolist(), rows[order].tolist()):
+            other = self.members[row]
+            self.pull(other)
+            found[owner].append(other)
+        return found
+
+    def overlaps(self):
+        """Return the rows of every overlapping pair, found by sweeping the rows sorted along x"""
+        n = len(self.members)
+        xs, ys, radii = self.xs[:n], self.ys[:n], self.radii[:n]
+
+        lo = xs - radii
+        order = numpy.argsort(lo, kind='mergesort')
+        ends = numpy.searchsorted(lo[order], (xs + radii)[order], side='right')
+
+        # pair each row with every later row that starts before it ends
+        counts = ends - numpy.arange(1, n + 1)
+        firsts = numpy.repeat(numpy.arange(n), counts)
+        seconds = numpy.arange(counts.sum()) - numpy.repeat(numpy.cumsum(counts) - counts, counts) + firsts + 1
+        firsts, seconds = order[firsts], order[seconds]
+        self.checks += len(firsts)
+
+        close = (xs[firsts] - xs[seconds]) ** 2 + (ys[firsts] - ys[seconds]) ** 2 <= \
+            (radii[firsts] + radii[seconds]) ** 2
+        close &= ~(self.is_static[firsts] & self.is_static[seconds])
+        return firsts[close], seconds[close]
+
+    def collisions(self):
+        pairs = []
+        for i, j in zip(*(rows.tolist() for rows in self.overlaps())):
+            c, other = self.members[i], self.members[j]
+            self.pull(c)
+            self.pull(other)
+            pairs.append((c, other) if c.serial < other.serial else (other, c))
+        pairs.sort(key=lambda pair: (pair[0].serial, pair[1].serial))
+        return pairs
+
+    def update(self):
+        """Move every character at once, then hand contacts to the usual rules"""
+        self.ticks += 1
+        self.cs.compact()
+        self.movers.compact()
+        with self.profiler.phase('move'):
+            self.step()
+
+        with self.profiler.phase('collide'):
+            for toast in self.handle_collisions():
+                yield toast
+
+        if self.recorder is not None:
+            self.recorder.ticked(self)
+
+    def step(self):
+        """Steer, step and rebound every row at once"""
+        n = len(self.members)
+        xs, ys, directions, velocities = self.xs[:n], self.ys[:n], self.directions[:n], self.velocities[:n]
+
+        # PCs steer by keys, NPCs that aren't static wander, drawing turns in the order the usual board moves them
+        for pc in self.pcs:
+            row = self.rows[pc]
+            directions[row], velocities[row] = pc.direction, pc.velocity
+        self.last_xs[:n], self.last_ys[:n] = xs, ys
+        wanderers = numpy.flatnonzero(~(self.is_pc[:n] | self.is_static[:n]))
+        wanderers = wanderers[numpy.argsort(self.row_serials[wanderers], kind='mergesort')]
+        rand = self.rng.movement
+        directions[wanderers] += [turn(rand) for _ in xrange(len(wanderers))]
+
+        xs += velocities * numpy.cos(-directions)
+        ys += velocities * numpy.sin(-directions)
+
+        # rebound off of walls as in Character.update
+        out = (xs < 0) | (xs > 1)
+        directions[out] = math.pi - directions[out]
+        numpy.clip(xs, 0, 1, out=xs)
+        out = (ys < 0) | (ys > 1)
+        directions[out] *= -1
+        numpy.clip(ys, 0, 1, out=ys)
+
+        self.rehash_rows()
+        self.sort()
+        for pc in self.pcs:
+            self.pull(pc)
+
+    def rehash_rows(self):
+        """Swap in fresh digests for the rows that moved, since step doesn't go through reindex"""
+        n = len(self.members)
+        moved = numpy.flatnonzero((self.xs[:n] != self.last_xs[:n]) | (self.ys[:n] != self.last_ys[:n]))
+        old = self.digests[moved]
+        new = digest(self.row_serials[moved].astype(numpy.uint64), self.row_levels[moved].view(numpy.uint64),
+                     self.xs[moved].view(numpy.uint64), self.ys[moved].view(numpy.uint64))
+        self.digests[moved] = new
+        self.state_hash = (self.state_hash + int(new.sum()) - int(old.sum())) & MASK
+
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+
+__author__ = 'Yatharth Agarwal <yatharth999@gmail.com>'
+
+"""Benchmark board ticks headlessly across engines, populations and layouts
+
+Run with plain CPython, e.g. `python bench.py --npcs 100,1000 --engines grid,arrays`.
+Each case prints one JSON object per line so runs can be diffed and compared.
+"""
+
+import sys
+import json
+import random
+import argparse
+import itertools
+from contextlib import contextmanager
+from timeit import default_timer
+
+import config
+from board import Board
+from arrays import ArrayBoard, numpy
+from exceps import WonException, DeadException
+
+
+# engines are broadphases for the object board, plus the array board
+ENGINES = ('grid', 'sweep', 'quadtree', 'arrays')
+
+LEVELS = {
+    'default': dict(),                                          # as configured for the game
+    'small': dict(MIN_SMALL_NPCS=sys.maxint),                   # nothing but level 1 food
+    'mixed': dict(MIN_SMALL_NPCS=0, MAX_NPC_INITIAL_LEVEL=20),  # wide spread of sizes
+}
+
+LAYOUTS = ('uniform', 'clustered')
+NO_OF_CLUSTERS = 8
+CLUSTER_SPREAD = 0.05
+
+
+@contextmanager
+def overrides(**values):
+    """Temporarily change config values"""
+    old = dict((name, getattr(config, name)) for name in values)
+    for name, value in values.iteritems():
+        setattr(config, name, value)
+    try:
+        yield
+    finally:
+        for name, value in old.iteritems():
+            setattr(config, name, value)
+
+
+def clustered():
+    """Return a position maker that scatters NPCs around a few centers"""
+    centers = [(random.random(), random.random()) for _ in xrange(NO_OF_CLUSTERS)]
+
+    def position():
+        x, y = random.choice(centers)
+        return (max(0, min(1, random.gauss(x, CLUSTER_SPREAD))),
+                max(0, min(1, random.gauss(y, CLUSTER_SPREAD))))
+    return position
+
+
+def percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def run(engine, npcs, levels, layout, ticks, seed):
+    """Build a board for a case and time its ticks"""
+    random.seed(seed)
+    settings = dict(LEVELS[levels], NO_OF_NPCS=npcs, NO_OF_PCS=0)
+    if engine != 'arrays':
+        settings['BROADPHASE'] = engine
+
+    with overrides(**settings):
+        start = default_timer()
+        board = ArrayBoard(seed) if engine == 'arrays' else Board(seed)
+        board.populate(clustered() if layout == 'clustered' else None)
+        populated = default_timer()
+
+        checks, latencies, ended = board.checks, [], None
+        try:
+            for _ in xrange(ticks):
+                tick_start = default_timer()
+                for _ in board.update():
+                    pass
+                latencies.append(default_timer() - tick_start)
+        except (WonException, DeadException) as e:
+            ended = type(e).__name__
+
+    latencies.sort()
+    return {
+        'engine': engine,
+        'npcs': npcs,
+        'levels': levels,
+        'layout': layout,
+        'seed': seed,
+        'ticks': len(latencies),
+        'ended': ended,
+        'populate_ms': (populated - start) * 1000,
+        'ticks_per_sec': len(latencies) / sum(latencies) if latencies else 0,
+        'p50_ms': percentile(latencies, 0.5) * 1000 if latencies else None,
+        'p99_ms': percentile(latencies, 0.99) * 1000 if latencies else None,
+        'checks_per_tick': float(board.checks - checks) / len(latencies) if latencies else None,
+        'state_hash': board.state_hash,
+        'phases_ms': board.profiler.report(),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark board ticks headlessly")
+    parser.add_argument('--engines', default='grid,sweep,quadtree,arrays', help="any of " + ', '.join(ENGINES))
+    parser.add_argument('--npcs', default='35,500,2000', help="populations to try")
+    parser.add_argument('--levels', default='default,small,mixed', help="any of " + ', '.join(sorted(LEVELS)))
+    parser.add_argument('--layouts', default=','.join(LAYOUTS), help="any of " + ', '.join(LAYOUTS))
+    parser.add_argument('--ticks', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', type=argparse.FileType('w'), default=sys.stdout)
+    args = parser.parse_args(argv)
+
+    engines = args.engines.split(',')
+    if 'arrays' in engines and numpy is None:
+        sys.stderr.write("skipping arrays engine: numpy isn't installed\n")
+        engines.remove('arrays')
+
+    for engine, npcs, levels, layout in itertools.product(
+            engines, map(int, args.npcs.split(',')), args.levels.split(','), args.layouts.split(',')):
+        result = run(engine, npcs, levels, layout, args.ticks, args.seed)
+        args.output.write(json.dumps(result, sort_keys=True) + '\n')
+        args.output.flush()
+
+
+if __name__ == '__main__':
+    main()
@@ -2,281 +2,355 @@
 
 __author__ = 'Yatharth Agarwal <yatharth999@gmail.com>'
 
-"""Define board and controller classes"""
+"""Define board class"""
 
-import random
 import math
-import itertools
+from collections import OrderedDict
+from operator import attrgetter
 
 import config
-from players import Character, PC, NPC
+from players import PC, NPC, touching
+from spatial import BROADPHASES
+from registry import Registry, Store
+from spawning import Spawner
+from streams import Streams
+from statehash import MASK, character_digest
+from levels import LevelHistogram
+from profiler import Profiler
 from exceps import WonException, DeadException
 
 
 class Board(object):
-    """Draw game board"""
+    """Simulate game board"""
+
+    SPAWN_BATCH = 1         # most spawn spots to check at once (see spawning.Spawner.place_each)
+
+    def __init__(self, seed=None):
+        self.rng = Streams(seed)    # same seed, same game (see streams.Streams)
+        self.pcs, self.npcs = [], Store()
+        self.cs, self.movers = Registry(), Registry()
+        self.pc_levels, self.npc_levels = LevelHistogram(), LevelHistogram()
+        self.index = BROADPHASES[config.BROADPHASE]()      # characters that move
+        self.statics = BROADPHASES[config.BROADPHASE]()    # characters that sit still (see static)
+        self.serials = 0        # serial the next character gets
+        self.checks = 0         # narrow-phase tests so far, for benchmarking
+        self.contacts = 0       # overlapping pairs found at the start of the last tick's collisions
+        self.profiler = Profiler()
+        self.spawner = Spawner(self, rand=self.rng.spawn)
+        self.ticks = 0
+        self.state_hash = 0     # sum of every character's digest (see statehash)
+        self.recorder = None    # where key events get written down, if anywhere (see replay.Recorder)
+
+    def place(self, maker, bounds=(0, 0, 1, 1)):
+        """Make a character in a free spot (see spawning.Spawner)"""
+        with self.profiler.phase('spawn'):
+            return self.spawner.place(maker, bounds)
+
+    def place_each(self, maker, count, add):
+        """Make several characters in free spots, handing each to add as it's made"""
+        with self.profiler.phase('spawn'):
+            return self.spawner.place_each(maker, count, add)
 
-    def __init__(self, size):
-        self.size = size
-        self.gridlines = size // config.NO_OF_GRIDLINES
+    def add_c(self, maker):
+        """Keep making characters until one doesn't overlap with anything else"""
+        with self.profiler.phase('spawn'):
+            for i in xrange(config.MAX_PLACEMENT_TRIES):
+                c = maker()
+                if self.collision_with(c) is None:
+                    break
+            else:
+                raise AssertionError("couldn't place character")
+        return c
 
-        self.pcs, self.npcs = [], []
+    def levels(self, c):
+        """Return the level histogram of a character's side"""
+        return self.pc_levels if isinstance(c, PC) else self.npc_levels
 
-    @property
-    def cs(self):
-        return self.pcs + self.npcs
+    def static(self, c):
+        """Check if a character sits still until eaten, like level 1 NPCs, which never move or grow"""
+        return isinstance(c, NPC) and c.level == 1
 
-    def add_c(self, maker):
-        """Keep making characters until one doesn't overlap with anything else"""
-        for i in xrange(config.MAX_PLACEMENT_TRIES):
-            c = maker()
-            if self.collision_with(c) is None:
-                break
+    def file(self, c):
+        """Index a character as static or moving"""
+        if self.static(c):
+            self.statics.insert(c)
         else:
-            raise AssertionError("couldn't place character")
-        return c
+            self.movers.add(c)
+            self.index.insert(c)
 
-    def add_npc(self):
-        def maker():
-            level = random.randrange(1, config.MAX_NPC_INITIAL_LEVEL) \
-                if sum(npc.level == 1 for npc in self.npcs) >= config.MIN_SMALL_NPCS else 1
-            x, y = random.random(), random.random()
-            return NPC(len(self.npcs), level, x, y)
+    def unfile(self, c):
+        if c in self.statics:
+            self.statics.remove(c)
+        else:
+            self.movers.remove(c)
+            self.index.remove(c)
+
+    def register(self, c):
+        """Start tracking a placed character's position"""
+        c.board, c.serial, c.digest = self, self.serials, 0
+        self.serials += 1
+        self.cs.add(c)
+        self.levels(c).add(c.level)
+        self.file(c)
+        self.rehash(c)
+
+    def unregister(self, c):
+        c.board = None
+        self.cs.remove(c)
+        self.levels(c).remove(c.level)
+        self.unfile(c)
+        self.state_hash = (self.state_hash - c.digest) & MASK
+
+    def rehash(self, c):
+        """Swap a character's old share of the state hash for one that matches it now"""
+        digest = character_digest(c)
+        self.state_hash = (self.state_hash + digest - c.digest) & MASK
+        c.digest = digest
+
+    def reindex(self, c):
+        """Keep the indexes and state hash in step with a character that moved or resized"""
+        self.rehash(c)
+        if c in self.statics:
+            self.statics.move(c)
+        else:
+            self.index.move(c)
 
-        npc = self.add_c(maker)
-        self.npcs.append(npc)
+    def leveled(self, c, old):
+        """Keep tallies, the indexes and state hash in step with a character whose level changed"""
+        if c.level == old:
+            self.rehash(c)
+            return
 
-    def add_pc(self, label=None):
-        def maker():
-            x, y = 1 / 4.0 + random.random() / 2.0, 0.5
-            return PC(len(self.pcs), 2, x, y, label)
+        self.levels(c).move(old, c.level)
+        if (c in self.statics) != self.static(c):
+            self.unfile(c)
+            self.file(c)
+            self.rehash(c)
+        else:
+            self.reindex(c)
+
+    def populate(self, position=None):
+        """Start a game"""
+        for _ in xrange(config.NO_OF_NPCS):
+            self.add_npc(position)
+        for _ in xrange(config.NO_OF_PCS):
+            self.add_pc()
+
+    def add_npc(self, position=None):
+        """Spawn an NPC in a free spot, or somewhere position makes up if given"""
+        if position is not None:
+            npc = self.add_c(lambda: NPC(None, self.npc_level(), *position(), rand=self.rng.spawn))
+        else:
+            npc = self.place(lambda: NPC(None, self.npc_level(), 0, 0, self.rng.spawn))
+        self.npcs.add(npc)
+        self.register(npc)
+        return npc
 
-        pc = self.add_c(maker)
+    def add_npcs(self, count):
+        """Spawn several NPCs in free spots, all sized by the board as it stands before the first"""
+        small = self.npc_levels[1] < config.MIN_SMALL_NPCS
+
+        def add(npc):
+            self.npcs.add(npc)
+            self.register(npc)
+
+        return self.place_each(lambda: NPC(None, self.npc_level(small), 0, 0, self.rng.spawn), count, add)
+
+    def npc_level(self, small=None):
+        """Return a spawning NPC's level, always 1 while the board is short of small NPCs"""
+        if small is None:
+            small = self.npc_levels[1] < config.MIN_SMALL_NPCS
+        return 1 if small else self.rng.spawn.randrange(1, config.MAX_NPC_INITIAL_LEVEL)
+
+    def add_pc(self, label=None):
+        """Spawn a PC in a free spot along the middle of the board"""
+        pc = self.place(lambda: PC(len(self.pcs), 2, 0, 0, label), (1 / 4.0, 0.5, 3 / 4.0, 0.5))
         self.pcs.append(pc)
+        self.register(pc)
+        return pc
 
     def keyPressed(self, key, keyCode):
+        if self.recorder is not None:
+            self.recorder.key(self.ticks, False, key, keyCode)
         for pc in self.pcs:
             pc.keyPressed(key, keyCode)
 
     def keyReleased(self, key, keyCode):
+        if self.recorder is not None:
+            self.recorder.key(self.ticks, True, key, keyCode)
         for pc in self.pcs:
             pc.keyReleased(key, keyCode)
 
+    def candidates(self, c):
+        """Return everything a character might overlap, leaving out other static characters if it's static"""
+        candidates = self.index.query(c.x, c.y, c.radius)
+        if len(self.statics) and c not in self.statics:
+            candidates.extend(self.statics.query(c.x, c.y, c.radius))
+        self.checks += len(candidates)
+        return candidates
+
     def collision_with(self, c):
         """Return collisions with a certain character, if any"""
-        for other in self.cs:
-            if c is not other and c.collides(other):
-                return other
+        candidates = self.candidates(c)
+        others = touching(c, candidates)
+        return others[0] if others else None
+
+    def collisions_with(self, c):
+        """Return all characters overlapping a certain character, oldest first"""
+        candidates = self.candidates(c)
+        others = touching(c, candidates)
+        others.sort(key=attrgetter('serial'))
+        return others
+
+    def collisions_with_each(self, cs):
+        """Return collisions_with for each of several characters, which some boards look up together"""
+        return [self.collisions_with(c) for c in cs]
+
+    def frees(self, cs):
+        """Say whether each of several characters overlaps nothing, checking each only when asked for it"""
+        return (self.collision_with(c) is None for c in cs)
+
+    def collisions(self):
+        """Return every overlapping pair once, oldest characters first, never pairing two static characters"""
+        candidates = list(self.index.pairs())
+        if len(self.statics):
+            for c in self.movers:
+                candidates.extend((c, other) for other in self.statics.query(c.x, c.y, c.radius))
+        self.checks += len(candidates)
+        pairs = [(c, other) if c.serial < other.serial else (other, c)
+                 for c, other in candidates if c.collides(other)]
+        pairs.sort(key=lambda pair: (pair[0].serial, pair[1].serial))
+        return pairs
 
     def collision(self):
         """Return collisions between any characters, if any"""
-        for c in self.cs:
-            other = self.collision_with(c)
-            if other is not None:
-                return c, other
-        return None, None
+        pairs = self.collisions()
+        return pairs[0] if pairs else (None, None)
+
+    @staticmethod
+    def separate(c, other, nx, ny):
+        """Push two characters apart along a unit normal, splitting the distance unless a wall gets in the way"""
+        reach = c.radius + other.radius + config.BOUNCE_SLACK
+        overlap = reach - ((c.x - other.x) * nx + (c.y - other.y) * ny)
+        c.x = max(0, min(1, c.x + nx * overlap / 2))
+        c.y = max(0, min(1, c.y + ny * overlap / 2))
+        other.x, other.y = max(0, min(1, c.x - nx * reach)), max(0, min(1, c.y - ny * reach))
+        c.x, c.y = max(0, min(1, other.x + nx * reach)), max(0, min(1, other.y + ny * reach))
+
+    def bounce(self, c, other):
+        """Separate two same-sized characters and swap their velocities along the line between them"""
+        dx, dy = c.x - other.x, c.y - other.y
+        distance = math.hypot(dx, dy)
+        nx, ny = (dx / distance, dy / distance) if distance else (1.0, 0.0)
+
+        self.separate(c, other, nx, ny)
+        if c.collides(other):
+            # pinned against walls, so part along whichever axis has room instead
+            nx, ny = (0.0, math.copysign(1, dy)) if abs(nx) > abs(ny) else (math.copysign(1, dx), 0.0)
+            self.separate(c, other, nx, ny)
+            if c.collides(other):
+                raise AssertionError("didn't uncollide")
+
+        # equal masses trade the parts of their velocities along the normal
+        (cvx, cvy), (ovx, ovy) = c.velocity_vector(), other.velocity_vector()
+        exchange = (ovx - cvx) * nx + (ovy - cvy) * ny
+        c.steer(cvx + exchange * nx, cvy + exchange * ny)
+        other.steer(ovx - exchange * nx, ovy - exchange * ny)
+
+        self.reindex(c)
+        self.reindex(other)
 
     def handle_collisions(self):
-        """Make the characters collide and eat"""
-        # TODO: collide elastically (need to change velocity as property and add resetter for after some updates)
+        """Make the characters collide and eat, resolving contacts in rounds
+
+        Each round resolves every contact the last one found, then looks for the contacts
+        whatever it changed picked up, all at once. Eaten NPCs get replaced all together once
+        every contact is resolved, in free spots, so the new ones have no contacts to look for.
+        """
+
+        with self.profiler.phase('search'):
+            pending = self.collisions()
+            self.contacts = len(pending)
+        respawns = 0
+        while pending:
+            changed = []
+            for c, other in pending:
+
+                # skip contacts that an earlier one already ate or separated
+                if c.board is not self or other.board is not self or not c.collides(other):
+                    continue
+
+                # if different levels, eat
+                if c.level != other.level:
+                    eaten = c if c.level < other.level else other
+                    eater = c if eaten is other else other
+                    eater.eat(eaten)
+                    changed.append(eater)
+
+                    # check for win case
+                    if self.pcs and self.pc_levels.max > 1 + self.npc_levels.max:
+                        raise WonException(eater)
+
+                    # kill if NPC, to be replaced later
+                    if eaten in self.npcs:
+                        self.npcs.remove(eaten)
+                        self.unregister(eaten)
+                        respawns += 1
+
+                    # if PC, diminish level
+                    else:
+                        try:
+                            eaten.level -= 1
 
-        c, other = self.collision()
-        while (c, other) != (None, None):
+                        # if dead, toast or error out
+                        except DeadException as e:
+                            self.pcs.remove(eaten)
+                            self.unregister(eaten)
+                            yield "{} died".format(eaten)
 
-            # if different levels, eat
-            if c.level != other.level:
-                eaten = c if c.level < other.level else other
-                eater = c if eaten is other else other
-                eater.eat(eaten)
+                            if not self.pcs:
+                                raise e
 
-                # check for win case
-                if self.pcs and max(pc.level for pc in self.pcs) > 1 + max(npc.level for npc in self.npcs):
-                    raise WonException(eater)
+                        # reset to center
+                        else:
+                            if eaten in self.pcs:
+                                self.spawner.nearest(eaten, 0.5, 0.5)
+                                eaten.remember()
+                                self.reindex(eaten)
+                                changed.append(eaten)
 
-                # kill if NPC and spawn a new one
-                if eaten in self.npcs:
-                    self.npcs.remove(eaten)
-                    self.add_npc()
+                                yield self.rng.cosmetic.choice(("You got eaten!", "Be careful!", "Small fish in a big pond..."))
 
-                # if PC, diminish level
+                # if same level, collide elastically
                 else:
-                    try:
-                        eaten.level -= 1
-
-                    # if dead, toast or error out
-                    except DeadException as e:
-                        self.pcs.remove(eaten)
-                        yield "{} died".format(eaten)
+                    self.bounce(c, other)
+                    changed.extend((c, other))
 
-                        if not self.pcs:
-                            raise e
+            # only what this round changed can have picked up new contacts
+            changed = [c for c in OrderedDict.fromkeys(changed) if c.board is self]
+            pending = [(moved, other) for moved, others in zip(changed, self.collisions_with_each(changed))
+                       for other in others]
 
-                    # reset to center
-                    else:
-                        if eaten in self.pcs:
-                            eaten.x = eaten.y = 0.5
-                            while self.collision_with(eaten) is not None:
-                                eaten.x = (eaten.x + 0.1) % 1
-                                if eaten.x == 0.5:
-                                    raise AssertionError("couldn't reset pc")
-
-                            yield random.choice(("You got eaten!", "Be careful!", "Small fish in a big pond..."))
-
-            # if same level, collide reflectively
-            else:
-                direction = - math.atan2(c.y - other.y, c.x - other.x)
-                for i in xrange(config.MAX_PLACEMENT_TRIES):
-                    c.update(direction, Character.velocity.fget(c))
-                    other.update(direction + math.pi, Character.velocity.fget(other))
-                    if not c.collides(other):
-                        break
-                else:
-                    raise AssertionError("didn't uncollide")
-
-            c, other = self.collision()
+        if respawns:
+            self.add_npcs(respawns)
 
     def update(self):
         """Move characters and handle collisions"""
-        for c in self.cs:
-            c.update()
-
-        for toast in self.handle_collisions():
-            yield toast
-
-    def make_conv(self):
-        """Generate appropriate viewport and return mapper"""
-        # TODO: since can't control x and y independently, can't maintain constant scale viewport for one player
-
-        if not self.pcs:
-            return lambda c: c * self.size
-
-        coords = tuple(itertools.chain(*((pc.x, pc.y) for pc in self.pcs)))
-        c_min, c_max = max(0, min(coords) - config.VIEW_SIDE_PADDING), min(1, max(coords) + config.VIEW_SIDE_PADDING)
-
-        m = self.size / (c_max - c_min)
-        k = - m * c_min
-
-        return lambda c: m*c + k
-
-    def draw_gridlines(self, conv):
-        stroke(color(0, 0, 0.75))
-        strokeWeight(0)
-        # offset = (self.size % config.NO_OF_GRIDLINES) / 2
-        # for c in range(offset, self.size + offset, config.NO_OF_GRIDLINES):
-        for raw_c in xrange(0, self.gridlines):
-            c = conv(float(raw_c) / self.gridlines)
-            line(c, 0, c, self.size)
-            line(0, c, self.size, c)
-
-    def draw(self):
-        conv = self.make_conv()
-        self.draw_gridlines(conv)
-        for c in self.cs:
-            c.draw(conv)
-
-class Controller(object):
-    """Handle board and draw play screen"""
-
-    def __init__(self):
-        self.playing = False
-        self.spectating = False
-        self.toasts, self.toast_started = [], None
-
-    def init(self):
-        self.playing = True
-        self.board = Board(config.SIZE)
-
-        for _ in xrange(config.NO_OF_NPCS):
-            self.board.add_npc()
-        for _ in xrange(config.NO_OF_PCS):
-            self.board.add_pc()
-
-    def keyPressed(self, key, keyCode):
-        if not self.playing and key == ' ':
-            self.init()
-        if self.playing:
-            self.board.keyPressed(key, keyCode)
-
-    def keyReleased(self, key, keyCode):
-        if self.playing:
-            self.board.keyReleased(key, keyCode)
-
-    def draw_toast(self):
-        """Draw toasts as overlays"""
-
-        if self.toasts and millis() >= self.toast_started + \
-                (config.LONG_TOAST_LENGTH if len(self.toasts) == 1 else config.SHORT_TOAST_LENGTH):
-            self.toasts = self.toasts[1:]
-            self.toast_started = millis()
-
-        if self.toasts:
-            message = self.toasts[0]
-
-            fill(color(0, 0, 0.25, 0.5))
-            strokeWeight(0)
-            rect(0, config.SIZE - 60, config.SIZE, 50)
-
-            textAlign(CENTER)
-            textSize(30)
-            fill(color(0, 0, 1, 0.5))
-            text(message, config.SIZE / 2.0, config.SIZE - 25)
-
-    def toast(self, message):
-        """Add message to toaster"""
-        if not self.toasts:
-            self.toast_started = millis()
-        self.toasts.append(message)
-
-    def draw_title(self):
-        textAlign(CENTER)
-
-        textSize(50)
-        fill(color(0, 0, 0))
-        text("Agar", config.SIZE / 2.0, 100)
-
-        textSize(30)
-        fill(color(0, 0, 0.75))
-        text("Press space to play", config.SIZE / 2.0, config.SIZE - 200)
-
-    def draw_levels(self):
-        """Show percentages to next level"""
-
-        if not self.board.pcs:
-            return
-
-        textAlign(LEFT)
-        textSize(12)
-        fill(color(0, 0, 0))
-
-        text("Percent to next level:", 20, 20)
-
-        for i, pc in enumerate(self.board.pcs):
-            percent = int(pc._level % 1 * 100)
-            text("{}: {}%".format(pc, percent), 20, 40 + 20*i)
-
-    def draw(self):
-        """Draw board and handle events"""
-
-        # ask to replay after giving time for the game's end to sink in
-        if self.spectating and not self.toasts:
-            self.playing = self.spectating = False
-
-        # draw board
-        if self.playing:
-            try:
-                for toast in self.board.update():
-                    self.toast(toast)
-            except DeadException as e:
-                self.spectating = True
-                self.toast("You lost! Max level: {}.".format(int(e.player.max_level)))
-            except WonException as e:
-                self.spectating = True
-                self.toast("You win! Level {}.".format(e.player.level))
-            else:
-                self.board.draw()
-                self.draw_levels()
-                self.draw_toast()
-
-        # show play screen
-        else:
-            self.draw_title()
+        self.ticks += 1
+        self.cs.compact()
+        self.movers.compact()
+        with self.profiler.phase('move'):
+            for c in self.movers:
+                c.remember()
+                c.update()
+
+        with self.profiler.phase('collide'):
+            for toast in self.handle_collisions():
+                yield toast
+
+        if self.recorder is not None:
+            self.recorder.ticked(self)
+
+    def sync(self):
+        """Bring characters up to date before they are read from outside a tick"""
+        pass
@@ -7,7 +7,7 @@ __author__ = 'Yatharth Agarwal <yatharth999@gmail.com>'
 
 SIZE = 500                              # size of window (in px)
 RADIUS_CONSTANT = 600.0                 # increase to make grid seem larger
-BACKGROUND_COLOR = color(255, 255, 255) # color of background (in RGB)
+BACKGROUND_COLOR = (0, 0, 1)            # color of background (in HSB)
 VIEW_SIDE_PADDING = 0.2                 # how much you can see around you (in % of grid)
 NO_OF_GRIDLINES = 20                    # grid lines (no)
 
@@ -15,7 +15,26 @@ NO_OF_NPCS = 35                         # non-playable characters at any time (n
 NO_OF_PCS = 2                           # playable characters to start with (no)
 MIN_SMALL_NPCS = 20                     # smallest, non-moving NPCs at any time (no)
 MAX_NPC_INITIAL_LEVEL = 5               # max level of spawning NPCs
+SEED = None                             # seed for every game's random numbers, or None for a different game each time
+REPLAY_PATH = None                      # file to record each game to, with {seed} filled in, or None (see replay.py)
+KEYFRAME_LENGTH = 600                   # ticks between snapshots embedded in recordings, for seeking (no)
+PLAYBACK_PATH = None                    # recording to watch instead of playing, or None (see view.Viewer)
+SCRUB_LENGTH = 300                      # ticks the arrow keys skip while watching a recording (no)
+NO_OF_TABULATED_LEVELS = 64             # levels to precompute sizes, speeds and colors for (see tables.LevelTable)
 
 LONG_TOAST_LENGTH = 2500                # duration of toasts normally (in milliseconds)
 SHORT_TOAST_LENGTH = 500                # duration of toasts with others queued (in milliseconds)
+TICK_LENGTH = 1000 / 60.0               # duration of a simulation tick, regardless of frame rate (in milliseconds)
+MAX_TICKS_PER_FRAME = 10                # ticks to catch up on in one frame before letting the game slow down (no)
 MAX_PLACEMENT_TRIES = 1000              # times to try placing a character without overlap (no)
+SPAWN_SPACING = 0.02                    # least distance between pooled spawn spots (in % of grid)
+BOUNCE_SLACK = 1e-9                     # gap left between bounced characters so they stop touching (in % of grid)
+BROADPHASE = 'grid'                     # collision index, 'grid', 'sweep' or 'quadtree' (see spatial.BROADPHASES)
+NO_OF_GRID_CELLS = 50                   # spatial hash cells per side for collision queries (no)
+QUADTREE_MAX_DEPTH = 8                  # deepest loose quadtree level, sized for level 1 blobs (no)
+PROFILING = True                        # time phases of ticks and frames (see profiler.Profiler)
+PROFILE_WINDOW = 300                    # latest samples kept per phase (no)
+SHOW_HUD = False                        # start with the frame timing overlay showing
+HUD_KEY = 'h'                           # key to toggle the frame timing overlay
+HUD_REFRESH_LENGTH = 250                # time between overlay refreshes (in milliseconds)
+FRAME_BUDGET = 1000 / 60.0              # frame time above which the overlay warns (in milliseconds)
@@ -19,3 +19,11 @@ class WonException(AgarException):
 
 class DeadException(AgarException):
     pass
+
+
+class DesyncException(Exception):
+    """Signal that a replayed board's state hash stopped matching the recorded one"""
+
+    def __init__(self, tick, expected, actual):
+        super(DesyncException, self).__init__("state hash differs at tick {}".format(tick))
+        self.tick, self.expected, self.actual = tick, expected, actual
@@ -6,14 +6,24 @@ __author__ = 'Yatharth Agarwal <yatharth999@gmail.com>'
 
 from collections import defaultdict
 
-from java.awt.event import KeyEvent
-from java.lang.reflect import Modifier
+try:
+    from java.awt.event import KeyEvent
+    from java.lang.reflect import Modifier
+except ImportError:
+    KeyEvent = None
 
 
+CODED = u'\uffff'                        # Processing's key for coded keys like arrows
+
 KEY_NAMES = defaultdict(lambda: 'UNKNOWN')
 
-for f in KeyEvent.getDeclaredFields():
-    if Modifier.isStatic(f.getModifiers()):
-        name = f.getName()
-        if name.startswith("VK_"):
-            KEY_NAMES[f.getInt(None)] = name[3:]
+# outside of Java, fall back to AWT's codes for the keys the game uses
+if KeyEvent is None:
+    KEY_NAMES.update({37: 'LEFT', 38: 'UP', 39: 'RIGHT', 40: 'DOWN'})
+
+else:
+    for f in KeyEvent.getDeclaredFields():
+        if Modifier.isStatic(f.getModifiers()):
+            name = f.getName()
+            if name.startswith("VK_"):
+                KEY_NAMES[f.getInt(None)] = name[3:]
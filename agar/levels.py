@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+
+__author__ = 'Yatharth Agarwal <yatharth999@gmail.com>'
+
+"""Keep running tallies of character levels"""
+
+
+class LevelHistogram(object):
+    """Count characters per level, keeping track of the highest level present"""
+
+    def __init__(self):
+        self.counts = [0]
+        self.max = 0
+
+    def __getitem__(self, level):
+        return self.counts[level] if level < len(self.counts) else 0
+
+    def add(self, level):
+        if level >= len(self.counts):
+            self.counts.extend([0] * (level + 1 - len(self.counts)))
+        self.counts[level] += 1
+        self.max = max(self.max, level)
+
+    def remove(self, level):
+        """Uncount a level, walking the max down past levels left empty"""
+        self.counts[level] -= 1
+        while self.max and not self.counts[self.max]:
+            self.max -= 1
+
+    def move(self, old, new):
+        self.remove(old)
+        self.add(new)
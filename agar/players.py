@@ -7,20 +7,39 @@ __author__ = 'Yatharth Agarwal <yatharth999@gmail.com>'
 import math
 import random
 
-import config
-from keys import KEY_NAMES
+from tables import RADII, VELOCITIES, FILLS, STROKES
+from keys import KEY_NAMES, CODED
 from exceps import DeadException
 
 
+def touching(c, candidates):
+    """Return the candidates overlapping a character, testing them all in one pass"""
+    x, y, radius = c.x, c.y, c.radius
+    return [other for other in candidates if other is not c and
+            (other.x - x) ** 2 + (other.y - y) ** 2 <= (other.radius + radius) ** 2]
+
+
+def turn(rand):
+    """Return how far an NPC veers in a tick, drawn the same way for every engine"""
+    return rand.randint(-1, 1) * rand.random() * (2*math.pi) / 35.0
+
+
 class Character(object):
     """Behave like a general character"""
 
     CLASS_NAME = 'p'
     DEAD_LEVEL = 0
 
+    # radius, color, stroke_color and _velocity are cached by derive() whenever level changes
+    __slots__ = ('id', '_level', 'x', 'y', 'last_x', 'last_y', 'board', 'serial', 'digest',
+                 'radius', 'color', 'stroke_color', '_velocity')
+
     def __init__(self, id_, level, x, y):
         self.id, self._level = id_, level
         self.x, self.y = x, y
+        self.last_x, self.last_y = x, y
+        self.board, self.serial = None, None
+        self.derive()
 
     def __str__(self):
         return "<{} id={} level={}>".format(self.CLASS_NAME, self.id, self.level)
@@ -35,13 +54,18 @@ class Character(object):
     @level.setter
     def level(self, value):
         """Adjust level, dying as appropriate"""
-        self._level = value
+        old, self._level = self.level, value
+        self.derive()
+        if self.board is not None:
+            self.board.leveled(self, old)
         if self.level <= self.DEAD_LEVEL:
             raise DeadException(self)
 
-    @property
-    def radius(self):
-        return self.level / config.RADIUS_CONSTANT
+    def derive(self):
+        """Cache everything that depends only on level"""
+        level = self.level
+        self.radius, self._velocity = RADII[level], VELOCITIES[level]
+        self.color, self.stroke_color = FILLS[level], STROKES[level]
 
     # @radius.setter
     # def radius(self, value):
@@ -50,36 +74,34 @@ class Character(object):
 
     @property
     def velocity(self):
-        """Calculate velocity according to complex math"""
-        # TODO: make feel more natural
-        return (1.0 / (math.log(self.level) / math.log(20) + 1)) * (1 / 200.0)
+        return self._velocity
 
     @velocity.setter
     def velocity(self, value):
         raise NotImplemented
 
-
-    @staticmethod
-    def shade(level):
-        return ((level + 1) / 20.0) % 0.8
-
-    @property
-    def color(self):
-        return color(self.shade(self.level), 0.75, 0.75)
-
-    @property
-    def stroke_color(self):
-        return color(self.shade(self.level), 1, 1)
-
     def collides(self, other):
-        """Check if overlapping"""
-        return dist(self.x, self.y, other.x, other.y) <= self.radius + other.radius
+        """Check if overlapping, comparing squared distances to skip the square root"""
+        dx, dy, reach = self.x - other.x, self.y - other.y, self.radius + other.radius
+        return dx * dx + dy * dy <= reach * reach
 
     def eat(self, other):
         """Grow based on how significant the food is"""
         # self.radius = math.pow(self.radius**3 + other.radius**3, 1/3.0)
         self.level = self._level + float(other.level) / self.level
 
+    def velocity_vector(self):
+        return self.velocity * math.cos(-self.direction), self.velocity * math.sin(-self.direction)
+
+    def steer(self, vx, vy):
+        """Head along a velocity, keeping the speed set by level"""
+        if vx or vy:
+            self.direction = - math.atan2(vy, vx)
+
+    def remember(self):
+        """Note the current position as the one drawing interpolates from"""
+        self.last_x, self.last_y = self.x, self.y
+
     def update(self, direction=None, velocity=None):
         """Move appropriately (and overridably), rebounding off of walls"""
 
@@ -97,13 +119,8 @@ class Character(object):
             self.direction *= -1
             self.y = max(min(self.y, 1), 0)
 
-    def draw(self, conv):
-        """Calculate diamater and draw blob"""
-        fill(self.color)
-        stroke(self.stroke_color)
-        strokeWeight(4)
-        diameter = conv(self.x + self.radius) - conv(self.x - self.radius)
-        ellipse(conv(self.x), conv(self.y), diameter, diameter)
+        if self.board is not None:
+            self.board.reindex(self)
 
 
 
@@ -113,6 +130,8 @@ class PC(Character, object):
     CLASS_NAME = 'pc'
     DEAD_LEVEL = 1
 
+    __slots__ = ('label', 'dir_name', 'max_level', '_directions')
+
     DEFAULT_LABELS = ['arrows', 'wasd', 'l,./', '=[]\\']
     DIR_NAMES = (
         ('RIGHT', 'UP', 'LEFT', 'DOWN'),
@@ -174,11 +193,11 @@ class PC(Character, object):
 
     @property
     def velocity(self):
-        return len(self._directions) and super(PC, self).velocity
+        return len(self._directions) and self._velocity
 
-    @property
-    def stroke_color(self):
-        return color(self.shade(self.level - 1), 1, 1)
+    def derive(self):
+        super(PC, self).derive()
+        self.stroke_color = STROKES[self.level - 1]
 
     def keyPressed(self, key, keyCode):
         """Note that a key was pressed if two weren't already"""
@@ -196,40 +215,26 @@ class PC(Character, object):
         except ValueError:
             pass
 
-    def draw(self, conv):
-        """Draw label below blob"""
-        super(PC, self).draw(conv)
-
-        # label = self.label
-        # if self.temporary_label is not None:
-        #     if millis() > self.temporary_end:
-        #         self.temporary_label = None
-        #     else:
-        #         label = self.temporary_label
-
-        textAlign(CENTER)
-        textSize(12)
-        fill(color(0, 0, 0, 0.75))
-        text(self.label, conv(self.x), conv(self.y + self.radius + 0.015))
-
 
 class NPC(Character, object):
     """Represent non-playable character"""
 
     CLASS_NAME = 'npc'
 
-    def __init__(self, id_, level, x, y):
+    __slots__ = ('direction',)
+
+    def __init__(self, id_, level, x, y, rand=random):
         super(NPC, self).__init__(id_, level, x, y)
-        self.direction = random.random() * (2*math.pi)
+        self.direction = rand.random() * (2*math.pi)
 
     @property
     def velocity(self):
         """Remain stationary if level 1"""
-        return self.level - 1 and super(NPC, self).velocity
+        return self.level - 1 and self._velocity
 
     def update(self, direction=None, velocity=None):
         """Change velocity a little randomly"""
-        self.direction += random.randint(-1, 1) * random.random() * (2*math.pi) / 35.0
+        self.direction += turn(self.board.rng.movement if self.board is not None else random)
         super(NPC, self).update(direction, velocity)
 
         # TODO: add AI
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+
+__author__ = 'Yatharth Agarwal <yatharth999@gmail.com>'
+
+"""Time phases of a tick or frame into rolling histograms"""
+
+import math
+from timeit import default_timer
+
+import config
+
+
+BUCKETS_PER_OCTAVE = 4
+NO_OF_BUCKETS = 30 * BUCKETS_PER_OCTAVE     # enough octaves of microseconds for about 15 minutes
+
+
+def bucket(seconds):
+    """Return the log-spaced bucket a duration falls in"""
+    mantissa, exponent = math.frexp(seconds * 1e6)
+    if exponent <= 0:
+        return 0
+    return min(NO_OF_BUCKETS - 1, exponent * BUCKETS_PER_OCTAVE + int((mantissa - 0.5) * 2 * BUCKETS_PER_OCTAVE))
+
+
+def bucket_limit(index):
+    """Return the upper bound of a bucket (in seconds)"""
+    exponent, part = divmod(index, BUCKETS_PER_OCTAVE)
+    return math.ldexp(0.5 + (part + 1) / (2.0 * BUCKETS_PER_OCTAVE), exponent) / 1e6
+
+
+class Histogram(object):
+    """Keep the latest samples in a ring buffer along with counts per bucket"""
+
+    def __init__(self, size=config.PROFILE_WINDOW):
+        self.samples = [0.0] * size
+        self.counts = [0] * NO_OF_BUCKETS
+        self.next = self.filled = 0
+        self.total = 0.0
+
+    def __len__(self):
+        return self.filled
+
+    def add(self, seconds):
+        """Record a sample, forgetting the oldest one once the window is full"""
+        if self.filled == len(self.samples):
+            old = self.samples[self.next]
+            self.counts[bucket(old)] -= 1
+            self.total -= old
+        else:
+            self.filled += 1
+
+        self.samples[self.next] = seconds
+        self.counts[bucket(seconds)] += 1
+        self.total += seconds
+        self.next = (self.next + 1) % len(self.samples)
+
+    @property
+    def mean(self):
+        return self.total / self.filled if self.filled else 0.0
+
+    @property
+    def latest(self):
+        return self.samples[self.next - 1] if self.filled else 0.0
+
+    def percentile(self, fraction):
+        """Estimate a percentile from the bucket counts, without sorting or allocating"""
+        if not self.filled:
+            return 0.0
+        rank, seen = fraction * self.filled, 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count:
+                return bucket_limit(index)
+        return bucket_limit(NO_OF_BUCKETS - 1)
+
+
+class Phase(object):
+    """Time a block into a histogram when used as a context manager"""
+
+    __slots__ = ('histogram', 'started')
+
+    def __init__(self):
+        self.histogram = Histogram()
+        self.started = None
+
+    def __enter__(self):
+        self.started = default_timer()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.add(default_timer() - self.started)
+
+
+class NullPhase(object):
+    """Stand in for a phase while profiling is switched off"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+NULL_PHASE = NullPhase()
+
+
+class Profiler(object):
+    """Hand out named phases, all of which can be switched off at once"""
+
+    def __init__(self, enabled=config.PROFILING):
+        self.enabled = enabled
+        self.phases = {}
+
+    def phase(self, name):
+        if not self.enabled:
+            return NULL_PHASE
+        phase = self.phases.get(name)
+        if phase is None:
+            phase = self.phases[name] = Phase()
+        return phase
+
+    def record(self, name, seconds):
+        """Add a sample timed some other way, like the gap between frames"""
+        if self.enabled:
+            self.phase(name).histogram.add(seconds)
+
+    def histogram(self, name):
+        """Return a phase's histogram, empty if it hasn't run yet"""
+        return self.phase(name).histogram if self.enabled else Histogram(0)
+
+    def report(self):
+        """Summarize every phase (in milliseconds)"""
+        return dict((name, {
+            'mean': phase.histogram.mean * 1000,
+            'p50': phase.histogram.percentile(0.5) * 1000,
+            'p99': phase.histogram.percentile(0.99) * 1000,
+        }) for name, phase in self.phases.iteritems())
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+
+__author__ = 'Yatharth Agarwal <yatharth999@gmail.com>'
+
+"""Keep track of every character on a board"""
+
+
+class Registry(object):
+    """Hold characters in the order they were added, with constant time adds and removes
+
+    Removing leaves a hole rather than shifting everything after it, so iterating stays
+    stable even while characters come and go. Holes get squeezed out by compact().
+    """
+
+    def __init__(self):
+        self.slots = []
+        self.positions = {}
+
+    def __len__(self):
+        return len(self.positions)
+
+    def __contains__(self, c):
+        return c in self.positions
+
+    def __iter__(self):
+        for c in self.slots:
+            if c is not None:
+                yield c
+
+    def add(self, c):
+        self.positions[c] = len(self.slots)
+        self.slots.append(c)
+
+    def remove(self, c):
+        self.slots[self.positions.pop(c)] = None
+
+    def compact(self):
+        """Squeeze out holes once they make up most of the slots"""
+        if len(self.slots) > 2 * len(self.positions):
+            self.slots = [c for c in self.slots if c is not None]
+            self.positions = dict((c, i) for i, c in enumerate(self.slots))
+
+
+class Store(object):
+    """Pack characters densely, giving each an id that is never handed out again
+
+    An id combines a slot with that slot's generation, which goes up whenever the slot is
+    freed, so a stale id stops resolving rather than pointing at whoever took its place.
+    """
+
+    SLOT_BITS = 20
+
+    def __init__(self):
+        self.dense = []
+        self.places = []
+        self.generations = []
+        self.free = []
+
+    def __len__(self):
+        return len(self.dense)
+
+    def __iter__(self):
+        return iter(self.dense)
+
+    def __getitem__(self, position):
+        return self.dense[position]
+
+    def __contains__(self, c):
+        return c.id is not None and self.get(c.id) is c
+
+    @classmethod
+    def slot(cls, id_):
+        return id_ & ((1 << cls.SLOT_BITS) - 1)
+
+    def index(self, id_):
+        """Return where a live id sits among the dense characters, or None"""
+        slot = self.slot(id_)
+        if slot < len(self.places) and self.generations[slot] == id_ >> self.SLOT_BITS:
+            return self.places[slot]
+
+    def get(self, id_):
+        position = self.index(id_)
+        return self.dense[position] if position is not None else None
+
+    def add(self, c):
+        """Store a character at the end, stamping it with a fresh id"""
+        if self.free:
+            slot = self.free.pop()
+        else:
+            slot = len(self.places)
+            if slot >> self.SLOT_BITS:
+                raise AssertionError("ran out of slots")
+            self.places.append(None)
+            self.generations.append(0)
+
+        self.places[slot] = len(self.dense)
+        self.dense.append(c)
+        c.id = self.generations[slot] << self.SLOT_BITS | slot
+
+    def remove(self, c):
+        """Move the last character into the removed one's place and retire its id"""
+        slot = self.slot(c.id)
+        position, last = self.places[slot], self.dense.pop()
+        if last is not c:
+            self.dense[position] = last
+            self.places[self.slot(last.id)] = position
+
+        self.places[slot] = None
+        self.generations[slot] += 1
+        self.free.append(slot)
+
+    def restore(self, dense, generations, free):
+        """Take over characters already stamped with ids, along with every slot's generation and the free slots"""
+        self.dense = list(dense)
+        self.generations, self.free = list(generations), list(free)
+        self.places = [None] * len(self.generations)
+        for position, c in enumerate(self.dense):
+            self.places[self.slot(c.id)] = position
@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+
+__author__ = 'Yatharth Agarwal <yatharth999@gmail.com>'
+
+"""Record games as their seed and key presses, and play them back without Processing
+
+A recording is a short header followed by records, all made of varints. Each record
+starts with the ticks since the last record shifted left by two, or'd with its kind.
+Every so often a record holds a whole snapshot of the board, and a footer after the
+last record lists where those keyframes are, so playback can jump anywhere quickly.
+Keyframes and the end record also carry the board's state hash, so playback that
+drifts from the original game gets caught where it first does.
+Run with plain CPython to replay one as fast as it goes, e.g. `python replay.py game.agr`.
+"""
+
+import sys
+import json
+import struct
+import bisect
+import argparse
+from timeit import default_timer
+
+import config
+from board import Board
+from arrays import ArrayBoard
+from exceps import WonException, DeadException, DesyncException
+import snapshot
+
+
+MAGIC = 'AGRP'
+VERSION = 7
+
+PRESS, RELEASE, END, KEYFRAME = 0, 1, 2, 3      # kinds of record
+KIND_BITS = 2
+
+INDEX_MAGIC = 'AGRI'
+FOOTER = struct.Struct('<Q4s')                  # where the keyframe index starts, INDEX_MAGIC
+
+
+def write_varint(stream, value):
+    """Write a non-negative integer seven bits at a time, lowest first"""
+    out = bytearray()
+    while value >= 0x80:
+        out.append(value & 0x7f | 0x80)
+        value >>= 7
+    out.append(value)
+    stream.write(str(out))
+
+
+def read_varint(stream):
+    value = shift = 0
+    while True:
+        byte = stream.read(1)
+        if not byte:
+            raise EOFError("recording ends mid-record")
+        value |= (ord(byte) & 0x7f) << shift
+        if not ord(byte) & 0x80:
+            return value
+        shift += 7
+
+
+class Recorder(object):
+    """Write down everything needed to replay a board: its seed, the keys pressed on it and keyframes"""
+
+    def __init__(self, stream, seed, npcs=config.NO_OF_NPCS, pcs=config.NO_OF_PCS,
+                 keyframe_length=config.KEYFRAME_LENGTH):
+        self.stream = stream
+        self.last_tick = 0
+        self.keyframe_length = keyframe_length
+        self.keyframes = []
+        stream.write(MAGIC)
+        for value in (VERSION, seed, npcs, pcs):
+            write_varint(stream, value)
+
+    def record(self, tick, kind, *values):
+        write_varint(self.stream, (tick - self.last_tick) << KIND_BITS | kind)
+        for value in values:
+            write_varint(self.stream, value)
+        self.last_tick = tick
+
+    def key(self, tick, released, key, keyCode):
+        """Note a key event that came in before the given tick ran"""
+        self.record(tick, RELEASE if released else PRESS, ord(key), keyCode)
+        self.stream.flush()
+
+    def ticked(self, board):
+        """Embed a snapshot of the board, and its state hash, every so many ticks"""
+        if board.ticks % self.keyframe_length == 0:
+            data = snapshot.dumps(board)
+            self.record(board.ticks, KEYFRAME)
+            self.keyframes.append((board.ticks, self.stream.tell()))
+            write_varint(self.stream, len(data))
+            self.stream.write(data)
+            write_varint(self.stream, board.state_hash)
+            self.stream.flush()
+
+    def close(self, tick, state_hash):
+        """Note when the game ended and how it stood, then index the keyframes and finish the recording"""
+        self.record(tick, END, state_hash)
+        start = self.stream.tell()
+        write_varint(self.stream, tick)
+        write_varint(self.stream, len(self.keyframes))
+        for keyframe in self.keyframes:
+            for value in keyframe:
+                write_varint(self.stream, value)
+        self.stream.write(FOOTER.pack(start, INDEX_MAGIC))
+        self.stream.close()
+
+
+class Recording(object):
+    """Read a recording's header and keyframe index, leaving its records to be read as needed"""
+
+    def __init__(self, stream):
+        if stream.read(len(MAGIC)) != MAGIC:
+            raise ValueError("not a recording")
+        version = read_varint(stream)
+        if version != VERSION:
+            raise ValueError("can't read version {} recordings".format(version))
+        self.stream = stream
+        self.seed, self.npcs, self.pcs = read_varint(stream), read_varint(stream), read_varint(stream)
+        self.start = stream.tell()
+        stream.seek(0, 2)
+        self.size = stream.tell()
+        self.end, self.keyframes = self.read_index()
+        self.keyframe_ticks = [tick for tick, _ in self.keyframes]
+
+    def read_index(self):
+        """Return the last tick and the (tick, offset) of every keyframe
+
+        A recording cut off before its footer (say, by closing the window) gets scanned instead.
+        """
+        if self.size - self.start >= FOOTER.size:
+            self.stream.seek(-FOOTER.size, 2)
+            start, magic = FOOTER.unpack(self.stream.read(FOOTER.size))
+            if magic == INDEX_MAGIC:
+                self.stream.seek(start)
+                end, count = read_varint(self.stream), read_varint(self.stream)
+                return end, [(read_varint(self.stream), read_varint(self.stream)) for _ in xrange(count)]
+
+        end, keyframes = 0, []
+        for tick, kind, value in self.records():
+            end = tick
+            if kind == KEYFRAME:
+                keyframes.append((tick, value[0]))
+        return end, keyframes
+
+    def records(self, offset=None, tick=0):
+        """Yield (tick, kind, value) for every record from an offset on (where the tick was as given)
+
+        The value is (key, keyCode) for key events, the snapshot's offset and state hash for
+        keyframes, and the state hash at the end. A record cut off partway ends them early.
+        """
+        self.stream.seek(self.start if offset is None else offset)
+        while True:
+            try:
+                tick, kind, value = self.read_record(tick)
+            except EOFError:
+                return
+            yield tick, kind, value
+            if kind == END:
+                return
+
+    def read_record(self, tick):
+        """Return the (tick, kind, value) of the record at the stream's position, or raise EOFError"""
+        header = read_varint(self.stream)
+        tick += header >> KIND_BITS
+        kind = header & ((1 << KIND_BITS) - 1)
+        if kind == END:
+            return tick, kind, read_varint(self.stream)
+        elif kind == KEYFRAME:
+            offset = self.stream.tell()
+            length = read_varint(self.stream)
+            if self.stream.tell() + length > self.size:
+                raise EOFError("recording ends mid-keyframe")
+            self.stream.seek(length, 1)
+            return tick, kind, (offset, read_varint(self.stream))
+        else:
+            return tick, kind, (unichr(read_varint(self.stream)), read_varint(self.stream))
+
+    def keyframe(self, offset):
+        """Return a keyframe's snapshot and state hash, leaving the stream at the record after it"""
+        self.stream.seek(offset)
+        data = self.stream.read(read_varint(self.stream))
+        return data, read_varint(self.stream)
+
+    def nearest_keyframe(self, tick):
+        """Return the (tick, offset) of the last keyframe at or before a tick, or None if there isn't one"""
+        i = bisect.bisect_right(self.keyframe_ticks, tick)
+        return self.keyframes[i - 1] if i else None
+
+
+class Player(object):
+    """Play a recording forwards, jumping to any tick by way of its keyframes"""
+
+    def __init__(self, recording, board_class=Board, check=True):
+        self.recording, self.board_class = recording, board_class
+        self.check = check
+        self.restart(None)
+
+    def restart(self, keyframe):
+        """Start over from a keyframe, or from the very beginning if there's none"""
+        recording = self.recording
+        if keyframe is None:
+            self.board = self.board_class(recording.seed)
+            for _ in xrange(recording.npcs):
+                self.board.add_npc()
+            for _ in xrange(recording.pcs):
+                self.board.add_pc()
+            self.records = recording.records()
+        else:
+            tick, offset = keyframe
+            self.board = snapshot.loads(recording.keyframe(offset)[0], self.board_class)
+            self.records = recording.records(recording.stream.tell(), tick)
+        self.upcoming = next(self.records, None)
+        self.ended = None
+
+    def seek(self, tick):
+        """Bring the board to a tick, from the nearest keyframe before it unless carrying on is closer"""
+        keyframe = self.recording.nearest_keyframe(tick)
+        if tick < self.board.ticks or keyframe is not None and keyframe[0] > self.board.ticks:
+            self.restart(keyframe)
+        self.advance(tick)
+
+    def advance(self, tick):
+        """Run the board on to a tick, feeding it keys as recorded, stopping early if the game ends
+
+        Raise DesyncException if checking and the board's state hash differs from the recorded
+        one at a keyframe or the end.
+        """
+        board = self.board
+        while board.ticks < tick and self.ended is None:
+            while self.upcoming is not None and self.upcoming[0] <= board.ticks:
+                _, kind, value = self.upcoming
+                if kind == END:
+                    self.verify(value)
+                    return
+                elif kind == KEYFRAME:
+                    self.verify(value[1])
+                elif kind == PRESS:
+                    board.keyPressed(*value)
+                elif kind == RELEASE:
+                    board.keyReleased(*value)
+                self.upcoming = next(self.records, None)
+            if self.upcoming is None:
+                return
+
+            try:
+                for _ in board.update():
+                    pass
+            except (WonException, DeadException) as e:
+                self.ended = e
+
+        if self.ended is not None and self.upcoming is not None and self.upcoming[1] == END:
+            self.verify(self.upcoming[2])
+
+    def verify(self, state_hash):
+        if self.check and self.board.state_hash != state_hash:
+            raise DesyncException(self.board.ticks, state_hash, self.board.state_hash)
+
+
+def replay(recording, board_class=Board, check=True):
+    """Rebuild a recorded game and run it to the end as fast as possible
+
+    Return the board along with whatever exception ended the game, if any.
+    """
+    player = Player(recording, board_class, check)
+    player.advance(recording.end)
+    return player.board, player.ended
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay a recorded game headlessly")
+    parser.add_argument('recording', type=argparse.FileType('rb'))
+    parser.add_argument('--engine', default='grid', help="grid, sweep, quadtree or arrays")
+    parser.add_argument('--no-check', dest='check', action='store_false',
+                        help="don't stop where the state hash stops matching the recording")
+    args = parser.parse_args(argv)
+
+    if args.engine != 'arrays':
+        config.BROADPHASE = args.engine
+    recording = Recording(args.recording)
+    player, desync = Player(recording, ArrayBoard if args.engine == 'arrays' else Board, args.check), None
+    start = default_timer()
+    try:
+        player.advance(recording.end)
+    except DesyncException as e:
+        desync = e.tick
+    elapsed = default_timer() - start
+    board, ended = player.board, player.ended
+
+    json.dump({
+        'engine': args.engine,
+        'seed': recording.seed,
+        'ticks': board.ticks,
+        'ended': type(ended).__name__ if ended is not None else None,
+        'state_hash': board.state_hash,
+        'desync_tick': desync,
+        'ticks_per_sec': board.ticks / elapsed if elapsed else None,
+        'phases_ms': board.profiler.report(),
+    }, sys.stdout, sort_keys=True)
+    sys.stdout.write('\n')
+
+
+if __name__ == '__main__':
+    main()
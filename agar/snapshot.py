@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+
+__author__ = 'Yatharth Agarwal <yatharth999@gmail.com>'
+
+"""Save a board's whole state as bytes and bring it back exactly
+
+Snapshots have a fixed layout: a header, the random generators' states, then one column per
+character field, so a whole board packs and unpacks with a handful of struct calls rather than
+one per character. Only PC labels, which can be any length, come after that.
+"""
+
+import struct
+
+from board import Board
+from players import PC, NPC
+from streams import Streams
+
+
+MAGIC = 'AGSN'
+VERSION = 6
+
+# magic, version, seed, ticks, serials, characters, PCs, spawner seed, spawner next, NPC slots, free NPC slots
+HEADER = struct.Struct('<4sHQIIIIqIII')
+NO_SEED = -1
+
+MT_WORDS = 624                          # words in a Mersenne Twister's state, besides its position
+STREAM = struct.Struct('<{}II?d'.format(MT_WORDS))   # words, position, has gauss, gauss
+
+# each is a column of one value per character, in the order the board holds them
+COLUMNS = (
+    ('is_pc', '?'),
+    ('id', 'Q'),            # PC number, or NPC id (see registry.Store), which outgrows 32 bits in a busy slot
+    ('place', 'I'),         # NPC's position in the store, or PC's in the board's list
+    ('serial', 'I'),
+    ('row', 'I'),           # position in an array board's arrays
+    ('_level', 'd'),
+    ('x', 'd'),
+    ('y', 'd'),
+    ('last_x', 'd'),
+    ('last_y', 'd'),
+    ('direction', 'd'),     # only NPCs keep one
+    ('max_level', 'd'),     # only PCs have one
+    ('keys', 'B'),          # PC's held directions, one bit each
+)
+
+
+def table(count):
+    """Return the struct that packs every column for so many characters"""
+    return struct.Struct('<' + ''.join('{}{}'.format(count, code) for _, code in COLUMNS))
+
+
+def getstate(generator):
+    """Return a Mersenne Twister's (words, position, gauss)"""
+    _, internal, gauss = generator.getstate()
+    return internal[:MT_WORDS], internal[MT_WORDS], gauss
+
+
+def setstate(generator, words, position, gauss):
+    generator.setstate((generator.getstate()[0], tuple(words) + (position,), gauss))
+
+
+def dumps(board):
+    """Return a board's state as bytes"""
+    board.sync()
+    cs, store = list(board.cs), board.npcs
+    spawner_seed, spawner_next = board.spawner.getstate()
+    out = [HEADER.pack(MAGIC, VERSION, board.rng.seed, board.ticks, board.serials, len(cs), len(board.pcs),
+                       NO_SEED if spawner_seed is None else spawner_seed, spawner_next,
+                       len(store.generations), len(store.free))]
+
+    for name in Streams.NAMES:
+        words, position, gauss = getstate(getattr(board.rng, name))
+        out.append(STREAM.pack(*(tuple(words) + (position, gauss is not None, gauss or 0))))
+
+    rows = getattr(board, 'rows', {})
+    pc_places = dict((pc, place) for place, pc in enumerate(board.pcs))
+    columns = (
+        [c in pc_places for c in cs],
+        [c.id for c in cs],
+        [pc_places[c] if c in pc_places else store.index(c.id) for c in cs],
+        [c.serial for c in cs],
+        [rows.get(c, 0) for c in cs],
+        [c._level for c in cs],
+        [c.x for c in cs],
+        [c.y for c in cs],
+        [c.last_x for c in cs],
+        [c.last_y for c in cs],
+        [0 if c in pc_places else c.direction for c in cs],
+        [c.max_level if c in pc_places else 0 for c in cs],
+        [sum(1 << d for d in c._directions) if c in pc_places else 0 for c in cs],
+    )
+    out.append(table(len(cs)).pack(*[value for column in columns for value in column]))
+    out.append(struct.pack('<{}Q{}I'.format(len(store.generations), len(store.free)),
+                           *(store.generations + store.free)))
+
+    for pc in board.pcs:
+        label = pc.label.encode('utf-8')
+        out.append(struct.pack('<H', len(label)) + label)
+    return ''.join(out)
+
+
+def loads(data, board_class=Board):
+    """Return a board rebuilt from bytes made by dumps"""
+    (magic, version, seed, ticks, serials, count, no_of_pcs, spawner_seed, spawner_next,
+     slots, free) = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("not a version {} snapshot".format(VERSION))
+    offset = HEADER.size
+
+    streams = []
+    for _ in Streams.NAMES:
+        values = STREAM.unpack_from(data, offset)
+        position, has_gauss, gauss = values[MT_WORDS:]
+        streams.append((values[:MT_WORDS], position, gauss if has_gauss else None))
+        offset += STREAM.size
+
+    layout = table(count)
+    values = layout.unpack_from(data, offset)
+    offset += layout.size
+    columns = dict((name, values[i * count:(i + 1) * count]) for i, (name, _) in enumerate(COLUMNS))
+    numbers = struct.unpack_from('<{}Q{}I'.format(slots, free), data, offset)
+    offset += 8 * slots + 4 * free
+
+    labels = []
+    for _ in xrange(no_of_pcs):
+        length, = struct.unpack_from('<H', data, offset)
+        labels.append(data[offset + 2:offset + 2 + length].decode('utf-8'))
+        offset += 2 + length
+
+    board = board_class(seed)
+    board.ticks = ticks
+    pcs, npcs = [None] * no_of_pcs, [None] * (count - no_of_pcs)
+    for i in xrange(count):
+        level, x, y, place = columns['_level'][i], columns['x'][i], columns['y'][i], columns['place'][i]
+        if columns['is_pc'][i]:
+            c = PC(columns['id'][i], level, x, y, labels[place])
+            c.max_level = columns['max_level'][i]
+            c._directions = set(d for d in xrange(4) if columns['keys'][i] >> d & 1)
+            pcs[place] = c
+        else:
+            c = NPC(columns['id'][i], level, x, y, board.rng.cosmetic)
+            c.direction = columns['direction'][i]
+            npcs[place] = c
+        c.last_x, c.last_y = columns['last_x'][i], columns['last_y'][i]
+
+        board.register(c)
+        c.serial = columns['serial'][i]
+        board.rehash(c)
+
+    # put everything back where it was, now that nothing is left to draw random numbers
+    board.pcs = pcs
+    board.npcs.restore(npcs, numbers[:slots], numbers[slots:])
+    board.serials = serials
+    if hasattr(board, 'arrange') and count:
+        board.arrange([c for _, c in sorted(zip(columns['row'], board.cs), key=lambda pair: pair[0])])
+
+    for name, state in zip(Streams.NAMES, streams):
+        setstate(getattr(board.rng, name), *state)
+    board.spawner.setstate((None if spawner_seed == NO_SEED else spawner_seed, spawner_next))
+    return board
@@ -0,0 +1,388 @@
+#!/usr/bin/env python3
+
+__author__ = 'Yatharth Agarwal <yatharth999@gmail.com>'
+
+"""Index characters by position for fast collision queries"""
+
+import math
+from itertools import islice
+
+import config
+
+
+class SpatialHash(object):
+    """Bucket characters into a uniform grid over the unit board"""
+
+    def __init__(self, cells=config.NO_OF_GRID_CELLS):
+        self.n = cells
+        self.cell_size = 1.0 / cells
+        self.cells = [[] for _ in xrange(cells * cells)]
+        self.spans = {}
+
+    def __len__(self):
+        return len(self.spans)
+
+    def __contains__(self, c):
+        return c in self.spans
+
+    def span(self, x, y, radius):
+        """Return the clamped (i0, j0, i1, j1) cells covered by a bounding box"""
+        last = self.n - 1
+        return (
+            max(0, min(last, int((x - radius) * self.n))),
+            max(0, min(last, int((y - radius) * self.n))),
+            max(0, min(last, int((x + radius) * self.n))),
+            max(0, min(last, int((y + radius) * self.n))),
+        )
+
+    def insert(self, c):
+        span = self.span(c.x, c.y, c.radius)
+        i0, j0, i1, j1 = span
+        for i in xrange(i0, i1 + 1):
+            for cell in self.cells[i * self.n + j0:i * self.n + j1 + 1]:
+                cell.append(c)
+        self.spans[c] = span
+
+    def remove(self, c):
+        i0, j0, i1, j1 = self.spans.pop(c)
+        for i in xrange(i0, i1 + 1):
+            for cell in self.cells[i * self.n + j0:i * self.n + j1 + 1]:
+                cell.remove(c)
+
+    def move(self, c):
+        """Rebucket a character only if it crossed into different cells"""
+        if self.spans[c] != self.span(c.x, c.y, c.radius):
+            self.remove(c)
+            self.insert(c)
+
+    def query(self, x, y, radius):
+        """Return characters sharing a cell with a circle's bounding box"""
+        i0, j0, i1, j1 = self.span(x, y, radius)
+        if i0 == i1 and j0 == j1:
+            return list(self.cells[i0 * self.n + j0])
+
+        found, seen = [], set()
+        for i in xrange(i0, i1 + 1):
+            for cell in self.cells[i * self.n + j0:i * self.n + j1 + 1]:
+                for c in cell:
+                    if c not in seen:
+                        seen.add(c)
+                        found.append(c)
+        return found
+
+    def pairs(self):
+        """Yield every pair of characters sharing a cell, once"""
+        for c in self.spans:
+            for other in self.query(c.x, c.y, c.radius):
+                if id(c) < id(other):
+                    yield c, other
+
+
+class Edge(object):
+    """Mark where a character's extent along x starts or ends"""
+
+    __slots__ = ('c', 'is_max', 'value', 'pos')
+
+    def __init__(self, c, is_max, value, pos):
+        self.c, self.is_max, self.value, self.pos = c, is_max, value, pos
+
+    def after(self, other):
+        """Order by value, putting starts before ends so touching extents overlap"""
+        return self.value > other.value or (self.value == other.value and self.is_max and not other.is_max)
+
+
+class Widths(object):
+    """Count extents per width, keeping track of the widest so it shrinks back once big ones go"""
+
+    def __init__(self):
+        self.counts = {}
+        self.max = 0
+
+    def add(self, width):
+        self.counts[width] = self.counts.get(width, 0) + 1
+        self.max = max(self.max, width)
+
+    def remove(self, width):
+        """Uncount a width, finding the next widest if it was the last of the widest"""
+        self.counts[width] -= 1
+        if not self.counts[width]:
+            del self.counts[width]
+            if width == self.max:
+                self.max = max(self.counts) if self.counts else 0
+
+    def move(self, old, new):
+        self.remove(old)
+        self.add(new)
+
+
+class SweepAndPrune(object):
+    """Keep characters sorted along x and remember which of them overlap there
+
+    Removed characters leave their edges behind as tombstones (edges of no one), squeezed out
+    once they make up most of the list. Edges after an insertion only get renumbered when one
+    of them next needs its position.
+    """
+
+    def __init__(self):
+        self.edges = []
+        self.bounds = {}
+        self.partners = {}
+        self.widths, self.extents = Widths(), {}      # how wide every character is, and each one's width
+        self.dead = 0
+        self.stale = 0      # edges from here on may have the wrong pos
+
+    def __len__(self):
+        return len(self.bounds)
+
+    def __contains__(self, c):
+        return c in self.bounds
+
+    def link(self, c, other):
+        self.partners[c].add(other)
+        self.partners[other].add(c)
+
+    def unlink(self, c, other):
+        self.partners[c].discard(other)
+        self.partners[other].discard(c)
+
+    def position(self, edge):
+        """Return where an edge sits, renumbering the stale edges first if it's one of them"""
+        if edge.pos >= self.stale:
+            edges = self.edges
+            for i in xrange(self.stale, len(edges)):
+                edges[i].pos = i
+            self.stale = len(edges)
+        return edge.pos
+
+    def bisect(self, value, after_equals=False):
+        """Return the index of the first edge past value (or at it, unless after_equals)"""
+        edges = self.edges
+        i, j = 0, len(edges)
+        while i < j:
+            mid = (i + j) // 2
+            if edges[mid].value < value or after_equals and edges[mid].value == value:
+                i = mid + 1
+            else:
+                j = mid
+        return i
+
+    def sift(self, edge):
+        """Insertion-sort an edge back into place, updating overlaps as it passes others"""
+        edges = self.edges
+        i = self.position(edge)
+
+        while i > 0 and edges[i - 1].after(edge):
+            other = edges[i - 1]
+            if other.c is not None:
+                if other.is_max and not edge.is_max:
+                    self.link(edge.c, other.c)
+                elif edge.is_max and not other.is_max:
+                    self.unlink(edge.c, other.c)
+            edges[i], other.pos = other, i
+            i -= 1
+
+        while i < len(edges) - 1 and edge.after(edges[i + 1]):
+            other = edges[i + 1]
+            if other.c is not None:
+                if edge.is_max and not other.is_max:
+                    self.link(edge.c, other.c)
+                elif other.is_max and not edge.is_max:
+                    self.unlink(edge.c, other.c)
+            edges[i], other.pos = other, i
+            i += 1
+
+        edges[i], edge.pos = edge, i
+
+    def overlapping(self, start, end, y=None, radius=0):
+        """Return characters whose extents along x overlap [start, end], and y +/- radius along y if given"""
+        found = []
+        for edge in islice(self.edges, self.bisect(start - self.widths.max), None):
+            if edge.value > end:
+                break
+            c = edge.c
+            if c is not None and not edge.is_max and c.x + c.radius >= start and \
+                    (y is None or abs(c.y - y) <= c.radius + radius):
+                found.append(c)
+        return found
+
+    def insert(self, c):
+        """Drop a character's edges straight into place, linking whatever it overlaps"""
+        lo, hi = Edge(c, False, c.x - c.radius, 0), Edge(c, True, c.x + c.radius, 0)
+        others = self.overlapping(lo.value, hi.value)
+
+        for edge in (lo, hi):
+            i = self.bisect(edge.value, after_equals=edge.is_max)
+            self.edges.insert(i, edge)
+            edge.pos = i
+            self.stale = min(self.stale, i)
+
+        self.bounds[c], self.partners[c] = (lo, hi), set()
+        self.extents[c] = 2 * c.radius
+        self.widths.add(self.extents[c])
+        for other in others:
+            self.link(c, other)
+
+    def remove(self, c):
+        for edge in self.bounds.pop(c):
+            edge.c = None
+        for other in self.partners.pop(c):
+            self.partners[other].discard(c)
+        self.widths.remove(self.extents.pop(c))
+
+        self.dead += 2
+        if self.dead > len(self.edges) // 2:
+            self.edges = [edge for edge in self.edges if edge.c is not None]
+            self.dead, self.stale = 0, 0
+
+    def move(self, c):
+        """Re-sort a character's edges, moving the leading one first so they never cross"""
+        lo, hi = self.bounds[c]
+        value = c.x - c.radius
+        first, second = (lo, hi) if value < lo.value else (hi, lo)
+        lo.value, hi.value = value, c.x + c.radius
+        self.sift(first)
+        self.sift(second)
+        width = 2 * c.radius
+        if width != self.extents[c]:
+            self.widths.move(self.extents[c], width)
+            self.extents[c] = width
+
+    def query(self, x, y, radius):
+        """Return characters whose bounding boxes overlap a circle's"""
+        return self.overlapping(x - radius, x + radius, y, radius)
+
+    def pairs(self):
+        """Yield every remembered overlap along x that also overlaps along y, once"""
+        for c, others in self.partners.iteritems():
+            for other in others:
+                if id(c) < id(other) and abs(c.y - other.y) <= c.radius + other.radius:
+                    yield c, other
+
+
+class Node(object):
+    """Hold characters centered in one quadrant, overlapping it by at most half its size"""
+
+    __slots__ = ('depth', 'i', 'j', 'items')
+
+    def __init__(self, depth, i, j):
+        self.depth, self.i, self.j = depth, i, j
+        self.items = []
+
+
+class LooseQuadtree(object):
+    """Store each character as deep as its size allows, so big and small blobs both stay cheap
+
+    Only quadrants holding characters are kept, in a table per depth keyed by position, so they
+    get looked up directly rather than walked down to from the root.
+    """
+
+    def __init__(self, max_depth=config.QUADTREE_MAX_DEPTH):
+        self.max_depth = max_depth
+        self.nodes = {}
+        self.levels = [{} for _ in xrange(max_depth + 1)]     # nodes holding characters at each depth, by i << depth | j
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def __contains__(self, c):
+        return c in self.nodes
+
+    def place(self, x, y, radius):
+        """Return the (depth, i, j) of the smallest quadrant whose loose bounds fit a circle"""
+        depth = self.max_depth if radius <= 0 else int(math.floor(-math.log(2 * radius, 2)))
+        depth = max(0, min(self.max_depth, depth))
+        while depth and 2 * radius > 1.0 / (1 << depth):
+            depth -= 1      # in case the log came out a hair too high
+        cells = 1 << depth
+        return depth, max(0, min(cells - 1, int(x * cells))), max(0, min(cells - 1, int(y * cells)))
+
+    def insert(self, c):
+        depth, i, j = self.place(c.x, c.y, c.radius)
+        node = self.levels[depth].get(i << depth | j)
+        if node is None:
+            node = self.levels[depth][i << depth | j] = Node(depth, i, j)
+        node.items.append(c)
+        self.nodes[c] = node
+
+    def remove(self, c):
+        node = self.nodes.pop(c)
+        node.items.remove(c)
+        if not node.items:
+            del self.levels[node.depth][node.i << node.depth | node.j]
+
+    def move(self, c):
+        """Move a character between quadrants only if its center or size class changed"""
+        node = self.nodes[c]
+        if (node.depth, node.i, node.j) != self.place(c.x, c.y, c.radius):
+            self.remove(c)
+            self.insert(c)
+
+    def nearby(self, x0, y0, x1, y1, deepest=None, after=-1):
+        """Return the nodes, down to a depth if given, holding characters that might overlap a box
+
+        Characters sit centered in their node's quadrant and no wider than half of it, so only
+        quadrants within half a quadrant of the box can hold any that overlap it. Depths with
+        fewer nodes than that get looked through whole instead. At the deepest depth, only
+        nodes keyed past after count.
+        """
+        found = []
+        deepest = self.max_depth if deepest is None else deepest
+        for depth in xrange(deepest + 1):
+            level = self.levels[depth]
+            if not level:
+                continue
+            first = after + 1 if depth == deepest else 0
+            cells = 1 << depth
+            i0, i1 = max(0, int(math.ceil(x0 * cells - 1.5))), min(cells - 1, int(x1 * cells + 0.5))
+            j0, j1 = max(0, int(math.ceil(y0 * cells - 1.5))), min(cells - 1, int(y1 * cells + 0.5))
+            if (i1 - i0 + 1) * (j1 - j0 + 1) > len(level):
+                found.extend(node for key, node in level.iteritems()
+                             if key >= first and i0 <= node.i <= i1 and j0 <= node.j <= j1)
+            else:
+                for row in xrange(i0 << depth, (i1 << depth) + 1, cells):
+                    found.extend([level[key] for key in xrange(max(first, row + j0), row + j1 + 1) if key in level])
+        return found
+
+    def query(self, x, y, radius):
+        """Return characters whose bounding boxes overlap a circle's"""
+        found = []
+        for node in self.nearby(x - radius, y - radius, x + radius, y + radius):
+            for c in node.items:
+                if abs(x - c.x) <= radius + c.radius and abs(y - c.y) <= radius + c.radius:
+                    found.append(c)
+        return found
+
+    def pairs(self):
+        """Yield every pair of characters whose bounding boxes overlap, once, in one pass over the nodes
+
+        Each node's items get paired with each other, and with the items of nodes no deeper than
+        it that they might overlap (same-depth ones only from one side).
+        """
+        for depth, level in enumerate(self.levels):
+            for key, node in level.items():
+                items = node.items
+                if len(items) == 1:
+                    c = items[0]
+                    x0, y0, x1, y1 = c.x - c.radius, c.y - c.radius, c.x + c.radius, c.y + c.radius
+                else:
+                    for k, c in enumerate(items):
+                        for other in items[k + 1:]:
+                            if abs(c.x - other.x) <= c.radius + other.radius and \
+                                    abs(c.y - other.y) <= c.radius + other.radius:
+                                yield c, other
+                    x0, y0 = min(c.x - c.radius for c in items), min(c.y - c.radius for c in items)
+                    x1, y1 = max(c.x + c.radius for c in items), max(c.y + c.radius for c in items)
+
+                for neighbor in self.nearby(x0, y0, x1, y1, depth, key):
+                    for c in items:
+                        for other in neighbor.items:
+                            if abs(c.x - other.x) <= c.radius + other.radius and \
+                                    abs(c.y - other.y) <= c.radius + other.radius:
+                                yield c, other
+
+
+BROADPHASES = {
+    'grid': SpatialHash,
+    'sweep': SweepAndPrune,
+    'quadtree': LooseQuadtree,
+}
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+
+__author__ = 'Yatharth Agarwal <yatharth999@gmail.com>'
+
+"""Find free spots to spawn characters at"""
+
+import math
+import random
+
+import config
+
+
+ATTEMPTS_PER_POINT = 30     # darts thrown around each point before giving up on it (Bridson's k)
+
+MIN_RING_STEP = 0.001       # closest the rings searched for a free spot get, for tiny characters (in % of grid)
+POOLS = {}                  # point sets by spacing, generated the same way every time and shared by every spawner
+
+
+def poisson_disk(spacing, rand=random):
+    """Return points spread over the unit square, no two closer than spacing (Bridson's algorithm)"""
+    cell_size = spacing / math.sqrt(2)
+    n = int(math.ceil(1 / cell_size))
+    grid = [None] * (n * n)
+
+    def cell(x, y):
+        return min(n - 1, int(x / cell_size)), min(n - 1, int(y / cell_size))
+
+    def fits(x, y):
+        i, j = cell(x, y)
+        for a in xrange(max(0, i - 2), min(n, i + 3)):
+            for b in xrange(max(0, j - 2), min(n, j + 3)):
+                point = grid[a * n + b]
+                if point is not None and (point[0] - x) ** 2 + (point[1] - y) ** 2 < spacing ** 2:
+                    return False
+        return True
+
+    def add(x, y):
+        i, j = cell(x, y)
+        grid[i * n + j] = (x, y)
+        points.append((x, y))
+        active.append((x, y))
+
+    points, active = [], []
+    add(rand.random(), rand.random())
+    while active:
+        k = rand.randrange(len(active))
+        x, y = active[k]
+        for _ in xrange(ATTEMPTS_PER_POINT):
+            angle, distance = rand.random() * 2 * math.pi, spacing * (1 + rand.random())
+            nx, ny = x + distance * math.cos(angle), y + distance * math.sin(angle)
+            if 0 <= nx < 1 and 0 <= ny < 1 and fits(nx, ny):
+                add(nx, ny)
+                break
+        else:
+            active[k] = active[-1]
+            active.pop()
+    return points
+
+
+class Spawner(object):
+    """Hand out free spots from an evenly spread pool of candidates, checking each against the board
+
+    The pool is shuffled and shifted (wrapping around) every time it runs out, so spots don't
+    repeat from one pass to the next, while the even spread means a gap is never far away.
+    """
+
+    def __init__(self, board, spacing=config.SPAWN_SPACING, rand=random):
+        self.board = board
+        self.rand = rand
+        if spacing not in POOLS:
+            POOLS[spacing] = poisson_disk(spacing, random.Random(spacing))
+        self.spacing = spacing
+        self.pool = POOLS[spacing]
+        self.seed, self.next = None, len(self.pool)
+        self.shift = 0, 0
+
+    def shuffle(self, seed):
+        """Lay out a pass over the pool, all decided by one seed so it can be laid out again"""
+        shuffler = random.Random(seed)
+        self.pool = list(POOLS[self.spacing])
+        shuffler.shuffle(self.pool)
+        self.shift = shuffler.random(), shuffler.random()
+        self.seed, self.next = seed, 0
+
+    def getstate(self):
+        return self.seed, self.next
+
+    def setstate(self, state):
+        seed, next_ = state
+        if seed is not None and seed != self.seed:
+            self.shuffle(seed)
+        self.next = next_
+
+    def candidate(self):
+        """Return the next pooled spot (in the unit square)"""
+        if self.next == len(self.pool):
+            self.shuffle(self.rand.getrandbits(32))
+        (u, v), (du, dv) = self.pool[self.next], self.shift
+        self.next += 1
+        return (u + du) % 1, (v + dv) % 1
+
+    def make(self, maker, bounds):
+        """Return a character from maker put at the next pooled spot within bounds"""
+        x0, y0, x1, y1 = bounds
+        u, v = self.candidate()
+        c = maker()
+        c.x = c.last_x = x0 + u * (x1 - x0)
+        c.y = c.last_y = y0 + v * (y1 - y0)
+        return c
+
+    def place(self, maker, bounds=(0, 0, 1, 1)):
+        """Return a character from maker put in a free spot within bounds (x0, y0, x1, y1)"""
+        return self.place_each(maker, 1, bounds=bounds)[0]
+
+    def place_each(self, maker, count, add=None, bounds=(0, 0, 1, 1)):
+        """Return so many characters from maker put in free spots within bounds, one after another
+
+        A fresh character is made for every spot tried, so makers that pick sizes at random
+        get to try smaller ones on a crowded board. Each character placed goes to add, if given,
+        which should put it on the board before the next gets placed.
+
+        Boards that check many spots at once more cheaply than one at a time (see
+        Board.SPAWN_BATCH) get spots in batches, each tried in turn against the board as it
+        was and the characters placed from the batch so far. Everything drawn past the last
+        character is taken back, so the game goes on just as if spots had been tried singly.
+        """
+        placed, tried, batch = [], 0, min(count, self.board.SPAWN_BATCH)
+        while True:
+            batch = min(batch, len(self.pool) - tried)
+            if batch <= 0:
+                raise AssertionError("couldn't place character")
+            state = (self.rand.getstate(), self.getstate()) if batch > 1 else None
+            cs = [self.make(maker, bounds) for _ in xrange(batch)]
+            fresh = []
+            for i, free in enumerate(self.board.frees(cs)):
+                tried += 1
+                c = cs[i]
+                if not free or any(c.collides(other) for other in fresh):
+                    continue
+                placed.append(c)
+                fresh.append(c)
+                tried = 0
+                if add is not None:
+                    add(c)
+                if len(placed) == count:
+                    if i + 1 < batch:
+                        self.rand.setstate(state[0])
+                        self.setstate(state[1])
+                        for _ in xrange(i + 1):
+                            self.make(maker, bounds)
+                    return placed
+            batch = min(2 * batch, self.board.SPAWN_BATCH)
+
+    def nearest(self, c, x, y):
+        """Move a character to the free spot nearest (x, y), trying rings of growing distance around it
+
+        Rings and the spots on each are a radius apart, so no gap the character fits in gets skipped.
+        """
+        step = max(c.radius, MIN_RING_STEP)
+        for ring in xrange(int(math.ceil(math.sqrt(2) / step)) + 1):
+            spots = max(1, int(math.ceil(2 * math.pi * ring)))
+            for spot in xrange(spots):
+                angle = 2 * math.pi * spot / spots
+                c.x, c.y = x + ring * step * math.cos(angle), y + ring * step * math.sin(angle)
+                if 0 <= c.x <= 1 and 0 <= c.y <= 1 and self.board.collision_with(c) is None:
+                    return c
+        raise AssertionError("couldn't find a free spot")
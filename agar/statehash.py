@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+
+__author__ = 'Yatharth Agarwal <yatharth999@gmail.com>'
+
+"""Hash board state a character at a time, so runs can be checked for the same outcome cheaply
+
+A board's hash is the sum of its characters' digests, wrapping at 64 bits. Order doesn't
+matter, and a character that changes only needs its old digest swapped for its new one.
+Digests only take integer arithmetic, so NumPy can work them out for a whole array of
+characters the same way.
+"""
+
+import struct
+
+
+MASK = (1 << 64) - 1
+FLOATS = struct.Struct('<3d')
+WORDS = struct.Struct('<3Q')
+
+# odd, so no change to a single field can cancel out
+SERIAL, LEVEL, X, Y = 0x9e3779b97f4a7c15, 0xc2b2ae3d27d4eb4f, 0x165667b19e3779f9, 0xd6e8feb86659fd93
+
+
+def mix(z):
+    """Scramble 64 bits so every input bit sways every output bit (SplitMix64's finalizer)
+
+    Works on ints as well as NumPy uint64 arrays.
+    """
+    z = (z ^ z >> 30) * 0xbf58476d1ce4e5b9 & MASK
+    z = (z ^ z >> 27) * 0x94d049bb133111eb & MASK
+    return z ^ z >> 31
+
+
+def digest(serial, level, x, y):
+    """Return a 64-bit digest of a character's serial and the bits of its level and position"""
+    return mix(serial * SERIAL + level * LEVEL + x * X + y * Y & MASK)
+
+
+def character_digest(c):
+    level, x, y = WORDS.unpack(FLOATS.pack(c._level, c.x, c.y))
+    return digest(c.serial, level, x, y)
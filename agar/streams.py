@@ -0,0 +1,19 @@
+#!/usr/bin/env python3
+
+__author__ = 'Yatharth Agarwal <yatharth999@gmail.com>'
+
+"""Give each board its own reproducible random numbers"""
+
+import random
+
+
+class Streams(object):
+    """Split one seed into a generator per use, so drawing more for one never shifts the others"""
+
+    NAMES = ('spawn', 'movement', 'cosmetic')
+
+    def __init__(self, seed=None):
+        self.seed = seed if seed is not None else random.getrandbits(32)
+        master = random.Random(self.seed)
+        for name in self.NAMES:
+            setattr(self, name, random.Random(master.getrandbits(64)))
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+
+__author__ = 'Yatharth Agarwal <yatharth999@gmail.com>'
+
+"""Look up everything that depends only on a character's level"""
+
+import math
+
+import config
+
+
+class LevelTable(object):
+    """Hold a value per integer level, working out higher levels the first time they're asked for"""
+
+    def __init__(self, compute, size=config.NO_OF_TABULATED_LEVELS):
+        self.compute = compute
+        self.values = []
+        self.extend(size - 1)
+
+    def extend(self, level):
+        """Tabulate every level up to and including this one"""
+        for missing in xrange(len(self.values), level + 1):
+            self.values.append(self.compute(missing))
+
+    def __getitem__(self, level):
+        if level < 0:
+            return self.compute(level)
+        if level >= len(self.values):
+            self.extend(level)
+        return self.values[level]
+
+
+def radius(level):
+    return level / config.RADIUS_CONSTANT
+
+
+def velocity(level):
+    """Calculate velocity according to complex math"""
+    # TODO: make feel more natural
+    if level <= 0:
+        return 0
+    return (1.0 / (math.log(level) / math.log(20) + 1)) * (1 / 200.0)
+
+
+def shade(level):
+    return ((level + 1) / 20.0) % 0.8
+
+
+RADII = LevelTable(radius)
+VELOCITIES = LevelTable(velocity)
+FILLS = LevelTable(lambda level: (shade(level), 0.75, 0.75))    # in HSB
+STROKES = LevelTable(lambda level: (shade(level), 1, 1))        # in HSB
@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+
+__author__ = 'Yatharth Agarwal <yatharth999@gmail.com>'
+
+"""Draw the game with Processing and pass its events on to the board"""
+
+import itertools
+
+import config
+from board import Board
+from replay import Recorder, Recording, Player
+from players import PC
+from keys import KEY_NAMES, CODED
+from exceps import WonException, DeadException
+
+
+PROCESSING_COLORS = {}
+
+
+def processing_color(hsb):
+    """Return the Processing color for an HSB tuple, making each one only once"""
+    value = PROCESSING_COLORS.get(hsb)
+    if value is None:
+        value = PROCESSING_COLORS[hsb] = color(*hsb)
+    return value
+
+
+def lerp(c, alpha):
+    """Return where a character is drawn, a fraction alpha of the way through its last tick"""
+    return c.last_x + (c.x - c.last_x) * alpha, c.last_y + (c.y - c.last_y) * alpha
+
+
+def draw_character(c, conv, alpha=1):
+    """Calculate diamater and draw blob"""
+    x, y = lerp(c, alpha)
+    fill(processing_color(c.color))
+    stroke(processing_color(c.stroke_color))
+    strokeWeight(4)
+    diameter = conv(x + c.radius) - conv(x - c.radius)
+    ellipse(conv(x), conv(y), diameter, diameter)
+
+
+def draw_label(pc, conv, alpha=1):
+    """Draw label below blob"""
+    x, y = lerp(pc, alpha)
+
+    # label = self.label
+    # if self.temporary_label is not None:
+    #     if millis() > self.temporary_end:
+    #         self.temporary_label = None
+    #     else:
+    #         label = self.temporary_label
+
+    textAlign(CENTER)
+    textSize(12)
+    fill(color(0, 0, 0, 0.75))
+    text(pc.label, conv(x), conv(y + pc.radius + 0.015))
+
+
+class BoardView(object):
+    """Draw game board"""
+
+    def __init__(self, board, size):
+        self.board = board
+        self.size = size
+        self.gridlines = size // config.NO_OF_GRIDLINES
+
+    def make_conv(self, alpha=1):
+        """Generate appropriate viewport and return mapper"""
+        # TODO: since can't control x and y independently, can't maintain constant scale viewport for one player
+
+        if not self.board.pcs:
+            return lambda c: c * self.size
+
+        coords = tuple(itertools.chain(*(lerp(pc, alpha) for pc in self.board.pcs)))
+        c_min, c_max = max(0, min(coords) - config.VIEW_SIDE_PADDING), min(1, max(coords) + config.VIEW_SIDE_PADDING)
+
+        m = self.size / (c_max - c_min)
+        k = - m * c_min
+
+        return lambda c: m*c + k
+
+    def draw_gridlines(self, conv):
+        stroke(color(0, 0, 0.75))
+        strokeWeight(0)
+        # offset = (self.size % config.NO_OF_GRIDLINES) / 2
+        # for c in range(offset, self.size + offset, config.NO_OF_GRIDLINES):
+        for raw_c in xrange(0, self.gridlines):
+            c = conv(float(raw_c) / self.gridlines)
+            line(c, 0, c, self.size)
+            line(0, c, self.size, c)
+
+    def draw(self, alpha=1):
+        """Draw the board between its last two ticks"""
+        profiler = self.board.profiler
+        self.board.sync()
+        conv = self.make_conv(alpha)
+
+        with profiler.phase('gridlines'):
+            self.draw_gridlines(conv)
+
+        with profiler.phase('characters'):
+            for c in self.board.cs:
+                draw_character(c, conv, alpha)
+                if isinstance(c, PC):
+                    draw_label(c, conv, alpha)
+
+
+class Controller(object):
+    """Handle board and draw play screen"""
+
+    def __init__(self):
+        self.playing = False
+        self.spectating = False
+        self.toasts, self.toast_started = [], None
+        self.showing_hud, self.hud_lines, self.hud_refreshed, self.hud_late = config.SHOW_HUD, [], None, False
+
+    def init(self):
+        self.playing = True
+        self.board = Board(config.SEED)
+        self.board.populate()
+        if config.REPLAY_PATH is not None:
+            seed = self.board.rng.seed
+            self.board.recorder = Recorder(open(config.REPLAY_PATH.format(seed=seed), 'wb'), seed)
+        self.view = BoardView(self.board, config.SIZE)
+        self.lag, self.last_frame, self.frame_ticks = 0, millis(), 0
+
+    def keyPressed(self, key, keyCode):
+        if not self.playing and key == ' ':
+            self.init()
+        if key == config.HUD_KEY:
+            self.showing_hud = not self.showing_hud
+        if self.playing:
+            self.board.keyPressed(key, keyCode)
+
+    def keyReleased(self, key, keyCode):
+        if self.playing:
+            self.board.keyReleased(key, keyCode)
+
+    def draw_toast(self):
+        """Draw toasts as overlays"""
+
+        if self.toasts and millis() >= self.toast_started + \
+                (config.LONG_TOAST_LENGTH if len(self.toasts) == 1 else config.SHORT_TOAST_LENGTH):
+            self.toasts = self.toasts[1:]
+            self.toast_started = millis()
+
+        if self.toasts:
+            message = self.toasts[0]
+
+            fill(color(0, 0, 0.25, 0.5))
+            strokeWeight(0)
+            rect(0, config.SIZE - 60, config.SIZE, 50)
+
+            textAlign(CENTER)
+            textSize(30)
+            fill(color(0, 0, 1, 0.5))
+            text(message, config.SIZE / 2.0, config.SIZE - 25)
+
+    def toast(self, message):
+        """Add message to toaster"""
+        if not self.toasts:
+            self.toast_started = millis()
+        self.toasts.append(message)
+
+    def draw_title(self):
+        textAlign(CENTER)
+
+        textSize(50)
+        fill(color(0, 0, 0))
+        text("Agar", config.SIZE / 2.0, 100)
+
+        textSize(30)
+        fill(color(0, 0, 0.75))
+        text("Press space to play", config.SIZE / 2.0, config.SIZE - 200)
+
+    def draw_levels(self):
+        """Show percentages to next level"""
+
+        if not self.board.pcs:
+            return
+
+        textAlign(LEFT)
+        textSize(12)
+        fill(color(0, 0, 0))
+
+        text("Percent to next level:", 20, 20)
+
+        for i, pc in enumerate(self.board.pcs):
+            percent = int(pc._level % 1 * 100)
+            text("{}: {}%".format(pc, percent), 20, 40 + 20*i)
+
+    def draw_hud(self):
+        """Show frame timing and board load, refreshing the text only every so often"""
+
+        now = millis()
+        if self.hud_refreshed is None or now >= self.hud_refreshed + config.HUD_REFRESH_LENGTH:
+            self.hud_refreshed = now
+            profiler = self.board.profiler
+
+            if profiler.enabled:
+                frames, intervals = profiler.histogram('frame'), profiler.histogram('interval')
+                self.hud_lines[:] = (
+                    "{:.0f} fps".format(1 / intervals.mean if intervals.mean else 0),
+                    "frame p50 {:.1f} ms".format(frames.percentile(0.5) * 1000),
+                    "frame p99 {:.1f} ms".format(frames.percentile(0.99) * 1000),
+                    "{} ticks/frame".format(self.frame_ticks),
+                    "{} characters".format(len(self.board.cs)),
+                    "{} contacts".format(self.board.contacts),
+                )
+                self.hud_late = frames.percentile(0.99) * 1000 > config.FRAME_BUDGET
+            else:
+                self.hud_lines[:] = ("profiling off",)
+                self.hud_late = False
+
+        textAlign(RIGHT)
+        textSize(12)
+        fill(color(0, 1, 0.75) if self.hud_late else color(0, 0, 0))
+
+        for i, line in enumerate(self.hud_lines):
+            text(line, config.SIZE - 20, 20 + 20*i)
+
+    def end(self):
+        """Stop playing, finishing the recording if there is one"""
+        self.spectating = True
+        if self.board.recorder is not None:
+            self.board.recorder.close(self.board.ticks, self.board.state_hash)
+            self.board.recorder = None
+
+    def tick(self):
+        """Run as many fixed-length ticks as have come due since the last frame"""
+        now = millis()
+        self.board.profiler.record('interval', (now - self.last_frame) / 1000.0)
+        self.lag = min(self.lag + now - self.last_frame, config.MAX_TICKS_PER_FRAME * config.TICK_LENGTH)
+        self.last_frame = now
+
+        self.frame_ticks = 0
+        while self.lag >= config.TICK_LENGTH:
+            self.lag -= config.TICK_LENGTH
+            self.frame_ticks += 1
+            for toast in self.board.update():
+                self.toast(toast)
+
+    def draw(self):
+        """Draw board and handle events"""
+
+        # ask to replay after giving time for the game's end to sink in
+        if self.spectating and not self.toasts:
+            self.playing = self.spectating = False
+
+        # draw board
+        if self.playing:
+            profiler = self.board.profiler
+            with profiler.phase('frame'):
+                try:
+                    with profiler.phase('tick'):
+                        self.tick()
+                except DeadException as e:
+                    self.end()
+                    self.toast("You lost! Max level: {}.".format(int(e.player.max_level)))
+                except WonException as e:
+                    self.end()
+                    self.toast("You win! Level {}.".format(e.player.level))
+                else:
+                    with profiler.phase('draw'):
+                        self.view.draw(self.lag / config.TICK_LENGTH)
+                        self.draw_levels()
+                        self.draw_toast()
+                    if self.showing_hud:
+                        self.draw_hud()
+
+        # show play screen
+        else:
+            self.draw_title()
+
+
+class Viewer(object):
+    """Play back a recording, with space to pause and the left and right arrows to scrub"""
+
+    def __init__(self, path):
+        self.player = Player(Recording(open(path, 'rb')))
+        self.view = BoardView(self.player.board, config.SIZE)
+        self.paused = False
+        self.lag, self.last_frame = 0, None
+
+    def keyPressed(self, key, keyCode):
+        if key == ' ':
+            self.paused = not self.paused
+        elif key == CODED and KEY_NAMES.get(keyCode) in ('LEFT', 'RIGHT'):
+            step = config.SCRUB_LENGTH if KEY_NAMES[keyCode] == 'RIGHT' else -config.SCRUB_LENGTH
+            self.player.seek(max(0, min(self.player.recording.end, self.player.board.ticks + step)))
+            self.lag = 0
+
+    def keyReleased(self, key, keyCode):
+        pass
+
+    def draw_progress(self):
+        textAlign(LEFT)
+        textSize(12)
+        fill(color(0, 0, 0))
+        text("{:.0f} / {:.0f} s{}".format(
+            self.player.board.ticks * config.TICK_LENGTH / 1000,
+            self.player.recording.end * config.TICK_LENGTH / 1000,
+            " (paused)" if self.paused else ""), 20, 20)
+
+    def draw(self):
+        """Run the recording on in real time, unless paused, and draw it"""
+        now = millis()
+        if self.last_frame is not None and not self.paused:
+            self.lag = min(self.lag + now - self.last_frame, config.MAX_TICKS_PER_FRAME * config.TICK_LENGTH)
+            ticks = int(self.lag // config.TICK_LENGTH)
+            self.lag -= ticks * config.TICK_LENGTH
+            self.player.advance(self.player.board.ticks + ticks)
+        self.last_frame = now
+
+        # seeking may have swapped in a board restored from a keyframe
+        self.view.board = self.player.board
+        self.view.draw(1 if self.paused else self.lag / config.TICK_LENGTH)
+        self.draw_progress()
@@ -0,0 +1,57 @@
+"""Check that every engine plays a seeded game out the same way, state hash for state hash"""
+
+import os
+import sys
+import random
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'agar'))
+
+import config
+from board import Board
+from arrays import ArrayBoard, numpy
+from exceps import WonException, DeadException
+
+
+def play(board_class, broadphase, seed, ticks=1000):
+    """Play a game with random key presses, returning the state hash after every tick"""
+    old, config.BROADPHASE = config.BROADPHASE, broadphase
+    try:
+        board = board_class(seed)
+        board.populate()
+    finally:
+        config.BROADPHASE = old
+
+    keys, hashes = random.Random(seed), [board.state_hash]
+    try:
+        for _ in xrange(ticks):
+            if keys.random() < 0.05:
+                key = keys.choice('wasd')
+                (board.keyPressed if keys.random() < 0.6 else board.keyReleased)(key, 0)
+            for _ in board.update():
+                pass
+            hashes.append(board.state_hash)
+    except (WonException, DeadException):
+        pass
+    return hashes
+
+
+class EngineTest(unittest.TestCase):
+
+    def check(self, board_class, broadphase):
+        for seed in xrange(3):
+            self.assertEqual(play(board_class, broadphase, seed), play(Board, 'grid', seed))
+
+    def test_sweep(self):
+        self.check(Board, 'sweep')
+
+    def test_quadtree(self):
+        self.check(Board, 'quadtree')
+
+    @unittest.skipIf(numpy is None, "needs numpy")
+    def test_arrays(self):
+        self.check(ArrayBoard, 'grid')
+
+
+if __name__ == '__main__':
+    unittest.main()
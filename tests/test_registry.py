@@ -0,0 +1,49 @@
+"""Check that the store keeps characters packed and never lets a stale id through"""
+
+import os
+import sys
+import random
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'agar'))
+
+from registry import Store
+
+
+class Thing(object):
+
+    def __init__(self):
+        self.id = None
+
+
+class StoreTest(unittest.TestCase):
+
+    def test_swap_remove_and_generations(self):
+        rand = random.Random(0)
+        store, live, retired = Store(), [], []
+        for _ in xrange(5000):
+            if live and rand.random() < 0.45:
+                c = live.pop(rand.randrange(len(live)))
+                store.remove(c)
+                retired.append(c.id)
+            else:
+                c = Thing()
+                store.add(c)
+                self.assertNotIn(c.id, retired)
+                live.append(c)
+
+            self.assertEqual(len(store), len(live))
+            self.assertEqual(set(store), set(live))
+            for c in rand.sample(live, min(10, len(live))):
+                self.assertIs(store.get(c.id), c)
+                self.assertIs(store[store.index(c.id)], c)
+                self.assertIn(c, store)
+            for id_ in rand.sample(retired, min(10, len(retired))):
+                self.assertIsNone(store.get(id_))
+
+        # a slot handed out again gets a new generation
+        self.assertTrue(any(id_ >> Store.SLOT_BITS for id_ in retired))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+"""Check that recordings replay exactly, even when cut off partway"""
+
+import io
+import os
+import sys
+import random
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'agar'))
+
+import replay
+from board import Board
+from exceps import WonException, DeadException
+
+
+class Kept(io.BytesIO):
+    """Hold on to what's written even after the recorder closes it"""
+
+    def close(self):
+        pass
+
+
+def record(seed, ticks=1500, keyframe_length=100):
+    """Play a game with random key presses, returning its recording and the state hash at every tick"""
+    stream, board = Kept(), Board(seed)
+    board.recorder = replay.Recorder(stream, seed, keyframe_length=keyframe_length)
+    board.populate()
+    keys, hashes = random.Random(seed), {0: board.state_hash}
+    try:
+        for _ in xrange(ticks):
+            if keys.random() < 0.05:
+                key = keys.choice('wasd')
+                (board.keyPressed if keys.random() < 0.6 else board.keyReleased)(key, 0)
+            for _ in board.update():
+                pass
+            hashes[board.ticks] = board.state_hash
+    except (WonException, DeadException):
+        hashes[board.ticks] = board.state_hash
+    board.recorder.close(board.ticks, board.state_hash)
+    return stream.getvalue(), hashes
+
+
+class RecordingTest(unittest.TestCase):
+
+    def test_replays_exactly(self):
+        for seed in xrange(3):
+            data, hashes = record(seed)
+            recording = replay.Recording(io.BytesIO(data))
+            board, _ = replay.replay(recording)
+            self.assertEqual(board.ticks, recording.end)
+            self.assertEqual(board.state_hash, hashes[recording.end])
+
+    def test_seeks_through_keyframes(self):
+        data, hashes = record(1)
+        player = replay.Player(replay.Recording(io.BytesIO(data)))
+        for tick in (700, 250, 1, 999, 420):
+            player.seek(tick)
+            self.assertEqual(player.board.state_hash, hashes[player.board.ticks])
+
+    def test_truncated_recordings_open(self):
+        for seed in xrange(2):
+            data, hashes = record(seed, 800)
+            offsets = [offset for _, offset in replay.Recording(io.BytesIO(data)).keyframes]
+
+            # cut partway through snapshots, just after a record's header, and anywhere else
+            cuts = [offset + 3 for offset in offsets[:2]] + [offsets[-1]]
+            cuts += [len(data) // 3, len(data) // 2, len(data) - 1]
+            for cut in cuts:
+                recording = replay.Recording(io.BytesIO(data[:cut]))
+                self.assertTrue(0 <= recording.end <= max(hashes))
+                self.assertTrue(all(tick <= recording.end for tick in recording.keyframe_ticks))
+                board, _ = replay.replay(recording)
+                self.assertEqual(board.state_hash, hashes[board.ticks])
+
+    def test_catches_desyncs(self):
+        data, _ = record(2)
+        recording = replay.Recording(io.BytesIO(data))
+        tick, offset = recording.keyframes[2]
+        recording.stream.seek(offset)
+        length = replay.read_varint(recording.stream)
+
+        # flip the lowest bit of the hash stored after the keyframe's snapshot
+        tampered = bytearray(data)
+        tampered[recording.stream.tell() + length] ^= 1
+        with self.assertRaises(replay.DesyncException) as caught:
+            replay.replay(replay.Recording(io.BytesIO(bytes(tampered))))
+        self.assertEqual(caught.exception.tick, tick)
+
+
+if __name__ == '__main__':
+    unittest.main()
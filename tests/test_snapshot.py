@@ -0,0 +1,66 @@
+"""Check that snapshots bring boards back exactly"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'agar'))
+
+import snapshot
+from board import Board
+from arrays import ArrayBoard, numpy
+from exceps import WonException, DeadException
+
+
+def run(board, ticks):
+    try:
+        for _ in xrange(ticks):
+            for _ in board.update():
+                pass
+    except (WonException, DeadException):
+        pass
+
+
+class SnapshotTest(unittest.TestCase):
+
+    def check(self, board_class):
+        for seed in xrange(3):
+            board = board_class(seed)
+            board.populate()
+            run(board, 400)
+            copy = snapshot.loads(snapshot.dumps(board), board_class)
+            self.assertEqual(snapshot.dumps(copy), snapshot.dumps(board))
+            self.assertEqual(copy.state_hash, board.state_hash)
+
+            # both go on the same way, random numbers and all
+            run(board, 300)
+            run(copy, 300)
+            self.assertEqual((copy.ticks, copy.state_hash), (board.ticks, board.state_hash))
+
+    def test_board(self):
+        self.check(Board)
+
+    @unittest.skipIf(numpy is None, "needs numpy")
+    def test_array_board(self):
+        self.check(ArrayBoard)
+
+    def test_ids_past_32_bits(self):
+        board = Board(0)
+        board.populate()
+        c = board.npcs[len(board.npcs) - 1]
+        for _ in xrange(5000):
+            board.npcs.remove(c)
+            board.unregister(c)
+            c = board.add_npc()
+        self.assertTrue(c.id >> 32)
+
+        copy = snapshot.loads(snapshot.dumps(board))
+        self.assertEqual(copy.npcs.get(c.id).serial, c.serial)
+
+    def test_rejects_other_data(self):
+        with self.assertRaises(ValueError):
+            snapshot.loads(b'AGSN' + b'\0' * snapshot.HEADER.size)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+"""Check that every broadphase finds every overlap, however characters come and go"""
+
+import os
+import sys
+import random
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'agar'))
+
+from spatial import BROADPHASES
+from players import NPC
+
+
+def overlapping(cs):
+    """Return every overlapping pair, found the slow way"""
+    return set(frozenset((c, other)) for i, c in enumerate(cs) for other in cs[i + 1:] if c.collides(other))
+
+
+class BroadphaseTest(unittest.TestCase):
+
+    def check(self, index, cs):
+        pairs = [frozenset(pair) for pair in index.pairs()]
+        self.assertEqual(len(pairs), len(set(pairs)), "a pair came out twice")
+        self.assertTrue(overlapping(cs) <= set(pairs))
+
+        for c in cs:
+            self.assertTrue(set(other for other in cs if other is not c and c.collides(other)) <=
+                            set(index.query(c.x, c.y, c.radius)))
+
+    def fuzz(self, name):
+        rand = random.Random(name)
+        for _ in xrange(5):
+            index, cs = BROADPHASES[name](), []
+            for step in xrange(600):
+                roll = rand.random()
+                if roll < 0.3 or len(cs) < 10:
+                    c = NPC(None, rand.choice((1, 1, 1, 2, 3, 5, 10, 25, 60)), rand.random(), rand.random(), rand)
+                    index.insert(c)
+                    cs.append(c)
+                elif roll < 0.45:
+                    c = cs.pop(rand.randrange(len(cs)))
+                    index.remove(c)
+                elif roll < 0.6:
+                    c = rand.choice(cs)
+                    c.level = max(1, c.level + rand.choice((-20, -1, 1, 2, 30)))
+                    index.move(c)
+                else:
+                    c = rand.choice(cs)
+                    c.x = max(0, min(1, c.x + rand.uniform(-0.05, 0.05)))
+                    c.y = max(0, min(1, c.y + rand.uniform(-0.05, 0.05)))
+                    index.move(c)
+
+                self.assertEqual(len(index), len(cs))
+                if step % 50 == 0:
+                    self.check(index, cs)
+            self.check(index, cs)
+
+    def test_grid(self):
+        self.fuzz('grid')
+
+    def test_sweep(self):
+        self.fuzz('sweep')
+
+    def test_quadtree(self):
+        self.fuzz('quadtree')
+
+
+if __name__ == '__main__':
+    unittest.main()